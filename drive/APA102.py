@@ -1,33 +1,74 @@
 # apa102.py  MicroPython 官方驱动（精简版，已兼容 APA102C）
 class APA102:
     ORDER = (0, 1, 2, 3)          # RGB 顺序；APA102C 要改成 (0,2,1,3)
-    def __init__(self, clk, data, n, *, brightness=31):
+    DMA_THRESHOLD = 4             # 端口 DMA 起步门槛(字节);帧缓冲最少 12 字节,恒走 DMA 路径
+    def __init__(self, clk, data, n, *, brightness=31, baudrate=8_000_000):
         from machine import SPI, Pin
         self.n = n
-        self.buf = bytearray(n * 4 + 8)   # 4 帧头 + 4*n 数据 + 4 帧尾
-        # 硬件 SPI 初始化
-        self.spi = SPI(1, baudrate=4_000_000,
+        self._brightness = brightness & 0x1F
+        self._hdr = 0xE0 | self._brightness   # 头字节预先算好,热路径免掉 OR/AND
+        # 单次拼接分配整个帧缓冲:4 帧头 0x00 + 4*n 数据(头字节预填) + 4 帧尾 0xFF,
+        # 免去逐字节填充循环;set_rgb 之后只需写 r/g/b 三个字节
+        self.buf = bytearray(b'\x00\x00\x00\x00'
+                             + (b'\x00\x00\x00' + bytes((self._hdr,))) * n
+                             + b'\xFF\xFF\xFF\xFF')
+        # 硬件 SPI 初始化 (APA102/APA102C 可跑 10-20 MHz,走线短可再调高 baudrate)
+        self.spi = SPI(1, baudrate=baudrate,
                        polarity=0, phase=1,
                        sck=clk, mosi=data)
-        # 帧头 0x00 *4
-        for i in range(4):
-            self.buf[i] = 0
-        # 帧尾 0xFF *4
-        for i in range(4):
-            self.buf[4 * n + 4 + i] = 0xFF
-        self._brightness = brightness & 0x1F
+
+    def set_rgb(self, i, r, g, b):
+        # 专用 3 通道路径:免 len() 检查和元组解包。
+        # 头字节初始化时已预填,这里只写三个颜色字节
+        # (若先前用 set_rgbw 改过该灯亮度,会保留那个亮度)
+        buf = self.buf
+        order = self.ORDER
+        base = 4 + 4 * i
+        buf[base + order[0]] = r
+        buf[base + order[1]] = g
+        buf[base + order[2]] = b
+
+    def set_rgbw(self, i, r, g, b, brightness):
+        buf = self.buf
+        order = self.ORDER
+        base = 4 + 4 * i
+        buf[base + order[0]] = r
+        buf[base + order[1]] = g
+        buf[base + order[2]] = b
+        buf[base + 3] = 0xE0 | (brightness & 0x1F)
 
     def __setitem__(self, i, color):
-        r, g, b, brightness = color
+        # 薄分发层:按元组长度挑专用方法,判断一次/调用而不是一次/字节
         if len(color) == 3:
-            brightness = self._brightness
+            self.set_rgb(i, color[0], color[1], color[2])
         else:
-            brightness &= 0x1F
+            self.set_rgbw(i, color[0], color[1], color[2], color[3])
+
+    def set_many(self, start, rgbw):
+        # 批量写入:rgbw 为 n*4 字节 RGBW 数据(解码器原始输出即可直接喂入),
+        # 单趟循环展开到帧缓冲,省去逐灯 __setitem__ 的元组打包/解包开销。
+        # W 字节忽略,亮度统一用驱动的全局亮度
+        buf = self.buf
         order = self.ORDER
-        self.buf[4 + 4 * i + order[0]] = r
-        self.buf[4 + 4 * i + order[1]] = g
-        self.buf[4 + 4 * i + order[2]] = b
-        self.buf[4 + 4 * i + 3] = 0xE0 | brightness
+        o0, o1, o2 = order[0], order[1], order[2]
+        hdr = self._hdr
+        base = 4 + 4 * start
+        for s in range(0, len(rgbw) & ~3, 4):
+            d = base + s
+            buf[d + o0] = rgbw[s]
+            buf[d + o1] = rgbw[s + 1]
+            buf[d + o2] = rgbw[s + 2]
+            buf[d + 3] = hdr
 
     def write(self):
-        self.spi.write(self.buf)
\ No newline at end of file
+        # 硬件 SPI 在多数端口(STM32/ESP32)内部走 DMA/FIFO,整帧一次写出
+        self.spi.write(self.buf)
+
+    async def write_async(self, chunk=256):
+        # 协作式刷新:长条灯带时分块写出,块间让出给 uasyncio 调度器,
+        # 避免一次阻塞 write 卡住整个事件循环
+        import uasyncio as asyncio
+        mv = memoryview(self.buf)
+        for i in range(0, len(mv), chunk):
+            self.spi.write(mv[i:i + chunk])
+            await asyncio.sleep_ms(0)
\ No newline at end of file
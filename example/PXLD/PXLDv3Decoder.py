@@ -4,20 +4,128 @@ PXLD v3 解碼器 - 極簡版
 功能: Frame → Slave → LED 三層精準訪問
 不依賴配置文件,純粹基於二進制格式解析 [1]
 """
+import array
+import functools
+import mmap
+import os
+import queue
 import struct
+import threading
 from typing import Dict, List, Tuple
+from collections import namedtuple
 from dataclasses import dataclass
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # 沒有 NumPy 時退回純 Python 路徑
+
+try:
+    import numba
+except ImportError:
+    numba = None  # 選配:CPython 主機上有裝 numba 時熱核心走 JIT
+
 # ==================== 常數 ====================
 V3_HEADER_SIZE = 64
 V3_FRAME_HEADER_SIZE = 32
 V3_SLAVE_ENTRY_SIZE = 24
 V3_BYTES_PER_LED = 4  # 固定 RGBW 4 bytes [1]
 
+# 預編譯的 struct 格式 (避免每次呼叫重新解析格式字串)
+# FileHeader: magic(4s) major(B) minor(B) fps(B) total_slaves(H) total_frames(I) total_pixels(I)
+_FILE_HDR = struct.Struct('<4sBBBHII')
+# FrameHeader: frame_id(I) 保留(4x) slave_table_size(I) pixel_data_size(I)
+_FRAME_HDR = struct.Struct('<I4xII')
+# 只取 FrameHeader 的兩個 size 欄位 (offset+8 起),建索引時用
+_FR_SIZES = struct.Struct('<II')
+# SlaveEntry: slave_id(B) 保留(x) channel_start(H) channel_count(H) pixel_count(H)
+#             data_offset(I) data_length(I) 保留(8x)
+_SLAVE_ENTRY = struct.Struct('<BxHHHII8x')
+_SLAVE_KEYS = ('slave_id', 'channel_start', 'channel_count',
+               'pixel_count', 'data_offset', 'data_length')
+# 單筆 SlaveEntry 用 namedtuple (~56 bytes) 取代 6 鍵 dict (~240 bytes),
+# 建構是一次 tuple pack,屬性讀取是 C 層索引
+_Slave = namedtuple('Slave', _SLAVE_KEYS)
+
+# LED 結構化 dtype (零拷貝解析整個 Slave 的像素資料)
+if np is not None:
+    _LED_DTYPE = np.dtype([('r', 'u1'), ('g', 'u1'), ('b', 'u1'), ('w', 'u1')])
+    # SlaveEntry 的結構化 dtype: 整張表一次 frombuffer 向量化解析,
+    # 取代逐筆 iter_unpack (欄位偏移對齊 24-byte 佈局,保留欄位略過)
+    _SLAVE_NP_DTYPE = np.dtype({
+        'names': list(_SLAVE_KEYS),
+        'formats': ['u1', '<u2', '<u2', '<u2', '<u4', '<u4'],
+        'offsets': [0, 2, 4, 6, 8, 12],
+        'itemsize': V3_SLAVE_ENTRY_SIZE,
+    })
+
+if np is not None and numba is not None:
+    @numba.njit(cache=True)
+    def _unpack_leds_nb(buf_u8):
+        # 編譯過的 (N,4) 可寫複本;微控制器上不會走到這裡
+        return buf_u8.reshape(-1, V3_BYTES_PER_LED).copy()
+
+    @numba.njit(cache=True)
+    def _parse_slave_table_nb(buf_u8, out):
+        # 每列一筆 SlaveEntry 的六個欄位;手組 little-endian,
+        # LLVM 會把逐位元組 OR 摺成單一載入指令
+        for i in range(out.shape[0]):
+            b = i * 24
+            out[i, 0] = buf_u8[b]
+            out[i, 1] = buf_u8[b + 2] | (buf_u8[b + 3] << 8)
+            out[i, 2] = buf_u8[b + 4] | (buf_u8[b + 5] << 8)
+            out[i, 3] = buf_u8[b + 6] | (buf_u8[b + 7] << 8)
+            out[i, 4] = (buf_u8[b + 8] | (buf_u8[b + 9] << 8)
+                         | (buf_u8[b + 10] << 16) | (buf_u8[b + 11] << 24))
+            out[i, 5] = (buf_u8[b + 12] | (buf_u8[b + 13] << 8)
+                         | (buf_u8[b + 14] << 16) | (buf_u8[b + 15] << 24))
+else:
+    _unpack_leds_nb = None
+    _parse_slave_table_nb = None
+
+# ==================== 熱核心: SlaveTable 解析 ====================
+def _parse_slave_table(data) -> List['_Slave']:
+    """
+    解析整張 SlaveTable 原始位元組為 List[_Slave]
+
+    逐格解碼的熱核心集中成這一個函式,之後要換成編譯版
+    (Cython/C 擴充) 只需提供同簽名的 _pxld_fast.parse_slave_table
+    """
+    if _parse_slave_table_nb is not None:
+        # numba 路徑:原生迴圈逐筆組欄位,無 CPython 逐呼叫分派
+        out = np.empty((len(data) // V3_SLAVE_ENTRY_SIZE, 6), dtype=np.int64)
+        _parse_slave_table_nb(np.frombuffer(data, dtype=np.uint8), out)
+        return list(map(_Slave._make, out.tolist()))
+    if np is not None:
+        # 向量化路徑:一次 frombuffer 解出全部欄位,
+        # 再按欄轉回 namedtuple (逐列 C 層 zip,無逐筆 unpack)
+        arr = np.frombuffer(data, dtype=_SLAVE_NP_DTYPE)
+        return list(map(_Slave._make,
+                        zip(*(arr[k].tolist() for k in _SLAVE_KEYS))))
+    return list(map(_Slave._make, _SLAVE_ENTRY.iter_unpack(data)))
+
+
+try:
+    # 選配:有編譯好的原生解析核心就整個換掉純 Python 版
+    from _pxld_fast import parse_slave_table as _parse_slave_table  # noqa: F811
+except ImportError:
+    pass
+
+# ==================== SWAR 打包 ====================
+def pack(r: int, g: int, b: int, w: int) -> int:
+    """RGBW 打包成單一 uint32 (比 LED 物件省 ~18 倍記憶體)"""
+    return (r << 24) | (g << 16) | (b << 8) | w
+
+
+def unpack(u: int) -> Tuple[int, int, int, int]:
+    """uint32 拆回 (R, G, B, W)"""
+    return (u >> 24) & 0xFF, (u >> 16) & 0xFF, (u >> 8) & 0xFF, u & 0xFF
+
+
 # ==================== 資料結構 ====================
-@dataclass
+@dataclass(slots=True)
 class LED:
-    """單個 LED (固定 4 bytes: RGBW) [1]"""
+    """單個 LED (固定 4 bytes: RGBW) [1];slots 免掉每實例 __dict__"""
     r: int
     g: int
     b: int
@@ -30,43 +138,137 @@ class LED:
         """返回 (R, G, B, W) 元組"""
         return (self.r, self.g, self.b, self.w)
 
+    def __iter__(self):
+        # 可疊代:tuple(led) 在 LED 物件與 numpy 結構化列上行為一致
+        return iter((self.r, self.g, self.b, self.w))
+
+
+class FrameView:
+    """
+    單一影格的輕量視圖
+
+    只記住各區段在 mmap 中的偏移;SlaveTable 與 PixelData 都是
+    用到才解析/切片,單一 Slave 訪問不必付整張表的解碼成本。
+    支援 frame['slaves'] 式的舊 dict 存取。
+    """
+    __slots__ = ('_decoder', 'frame_id', 'timestamp_ms',
+                 '_table_start', '_table_size', '_pixel_start', '_pixel_size',
+                 '_slaves', '_slaves_by_id')
+
+    def __init__(self, decoder, frame_id, timestamp_ms,
+                 table_start, table_size, pixel_start, pixel_size):
+        self._decoder = decoder
+        self.frame_id = frame_id
+        self.timestamp_ms = timestamp_ms
+        self._table_start = table_start
+        self._table_size = table_size
+        self._pixel_start = pixel_start
+        self._pixel_size = pixel_size
+        self._slaves = None  # 延遲解析
+        self._slaves_by_id = None
+
+    def slave(self, index: int) -> _Slave:
+        """解析表中第 index 筆 SlaveEntry (O(1),不掃整張表)"""
+        if not 0 <= index < self._table_size // V3_SLAVE_ENTRY_SIZE:
+            raise IndexError(f"Slave 索引 {index} 超出範圍")
+        return _Slave(*_SLAVE_ENTRY.unpack_from(
+            self._decoder.mm, self._table_start + index * V3_SLAVE_ENTRY_SIZE))
+
+    @property
+    def slaves(self) -> List[_Slave]:
+        """完整 SlaveTable (首次訪問才解析;靜態拓撲時全片共用同一份)"""
+        if self._slaves is None:
+            mm = self._decoder.mm
+            # bytes(): mmap 切片本來就是 bytes (零成本),退回緩衝時
+            # 把 bytearray 切片轉成可雜湊的鍵
+            data = bytes(mm[self._table_start:self._table_start + self._table_size])
+            # 常見情況:整個檔案每格的 SlaveTable 位元組完全相同,
+            # 以原始位元組為鍵共用解析結果,免去逐格重新解碼
+            cache = self._decoder._slave_table_cache
+            slaves = cache.get(data)
+            if slaves is None:
+                slaves = _parse_slave_table(data)
+                if len(cache) < 8:  # 小上限,防多變拓撲撐爆快取
+                    cache[data] = slaves
+            self._slaves = slaves
+        return self._slaves
+
+    @property
+    def slaves_by_id(self) -> Dict[int, _Slave]:
+        """slave_id → SlaveEntry 的索引 (建一次,查詢 O(1))"""
+        if self._slaves_by_id is None:
+            self._slaves_by_id = {s.slave_id: s for s in self.slaves}
+        return self._slaves_by_id
+
+    @property
+    def pixel_data(self) -> memoryview:
+        """原始像素資料 (mmap 上的零拷貝視圖;需要 bytes 時自行 bytes(...))"""
+        mv = memoryview(self._decoder.mm)
+        return mv[self._pixel_start:self._pixel_start + self._pixel_size]
+
+    def __getitem__(self, key):
+        # 向後相容: 舊版 get_frame 回傳 dict
+        if key in ('frame_id', 'timestamp_ms', 'slaves', 'pixel_data'):
+            return getattr(self, key)
+        raise KeyError(key)
+
 # ==================== 解碼器 ====================
 class PXLDv3Decoder:
     """PXLD v3 解碼器 - 三層訪問架構"""
     
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, cache: int = 128):
+        """
+        參數:
+            filepath: PXLD v3 檔案路徑
+            cache: get_frame 的 LRU 快取大小 (0 表示停用,省記憶體)
+        """
         self.filepath = filepath
         self.file = None
+        self.mm = None
         self.fps = 0
         self.total_frames = 0
         self.total_slaves = 0
         self.total_pixels = 0
         self.frame_offsets = []
-        
+        self._slave_table_cache = {}  # 原始表位元組 → 解析好的 List[_Slave]
+
+        # 循環播放 / 反覆抓同一影格時直接命中快取 (綁在實例上,
+        # 避免 lru_cache 掛在類別方法造成實例無法回收)
+        if cache:
+            self.get_frame = functools.lru_cache(maxsize=cache)(self._decode_frame)
+        else:
+            self.get_frame = self._decode_frame
+
         self._open_and_index()
     
     def _open_and_index(self):
         """開啟檔案並建立索引 [1]"""
         self.file = open(self.filepath, 'rb')
-        
+        # 整個檔案 mmap 一次,之後全部用偏移切片,不再 seek+read
+        try:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # mmap 不可用 (特殊檔案系統等):退回單一預配置緩衝 —
+            # 一次 readinto 整個檔案,建索引就不必逐格發 32-byte 讀取
+            size = os.fstat(self.file.fileno()).st_size
+            buf = bytearray(size)
+            self.file.readinto(buf)
+            self.mm = buf
+
         # 讀取 FileHeader (64 bytes)
-        header = self.file.read(V3_HEADER_SIZE)
-        
+        header = self.mm[:V3_HEADER_SIZE]
+
         # 驗證 Magic
         magic = header[0:4].decode('ascii')
         if magic != 'PXLD':
             raise ValueError("不是有效的 PXLD v3 檔案")
         
-        # 解析 Header [1]
-        major_version = header[4]
+        # 解析 Header [1] (單次 unpack,不逐欄位切片)
+        _, major_version, _, self.fps, self.total_slaves, \
+            self.total_frames, self.total_pixels = _FILE_HDR.unpack_from(header)
         if major_version != 3:
             raise ValueError(f"不支援版本 {major_version},僅支援 v3")
         
-        self.fps = header[6]
-        self.total_slaves = struct.unpack('<H', header[7:9])[0]
-        self.total_frames = struct.unpack('<I', header[9:13])[0]
-        self.total_pixels = struct.unpack('<I', header[13:17])[0]
-        
         # 建立影格索引
         self._build_frame_index()
         
@@ -77,109 +279,307 @@ class PXLDv3Decoder:
         print(f"   總 LED: {self.total_pixels}")
     
     def _build_frame_index(self):
-        """建立所有影格的偏移索引 [1]"""
-        self.frame_offsets = []
+        """建立所有影格的偏移索引 [1] (有效的側車索引檔則直接載入)"""
+        # 側車檔 <filepath>.idx: total_frames 筆 uint64 偏移,
+        # 再次開啟大檔時跳過 O(N) 掃描
+        idx_path = self.filepath + '.idx'
+        try:
+            if (os.path.getsize(idx_path) == self.total_frames * 8
+                    and os.path.getmtime(idx_path) >= os.path.getmtime(self.filepath)):
+                offsets = array.array('Q')
+                with open(idx_path, 'rb') as f:
+                    offsets.fromfile(f, self.total_frames)
+                self.frame_offsets = offsets
+                return
+        except OSError:
+            pass  # 索引檔不存在或讀不到,走完整掃描
+
+        unpack_sizes = _FR_SIZES.unpack_from
+        mm = self.mm
+        file_size = len(mm)
+
+        # 固定步距快速路徑:每格大小一致時 (同一拓撲的正常輸出),
+        # 首格步距 × 總格數應恰好吃滿整個檔案,且末格 FrameHeader
+        # 的兩個 size 欄位與首格相同 — 此時所有偏移直接等差算出,
+        # 免去逐格走訪
+        if (self.total_frames > 0
+                and V3_HEADER_SIZE + V3_FRAME_HEADER_SIZE <= file_size):
+            first_sizes = unpack_sizes(mm, V3_HEADER_SIZE + 8)
+            stride = V3_FRAME_HEADER_SIZE + first_sizes[0] + first_sizes[1]
+            last_offset = V3_HEADER_SIZE + stride * (self.total_frames - 1)
+
+            if (stride > V3_FRAME_HEADER_SIZE
+                    and V3_HEADER_SIZE + stride * self.total_frames == file_size
+                    and unpack_sizes(mm, last_offset + 8) == first_sizes):
+                self.frame_offsets = array.array(
+                    'Q', (V3_HEADER_SIZE + stride * i
+                          for i in range(self.total_frames)))
+                return
+
+        # 索引存成 array('Q') (每筆 8 bytes,比 Python int list 省數倍記憶體)
+        # 熱迴圈用到的屬性全提成區域變數 (LOAD_ATTR → LOAD_FAST)
+        self.frame_offsets = offsets = array.array('Q', [0]) * self.total_frames
         current_offset = V3_HEADER_SIZE
-        
-        for _ in range(self.total_frames):
-            self.frame_offsets.append(current_offset)
-            
-            # 讀取 FrameHeader 計算下一個影格位置
-            self.file.seek(current_offset)
-            frame_header = self.file.read(V3_FRAME_HEADER_SIZE)
-            
-            slave_table_size = struct.unpack('<I', frame_header[8:12])[0]
-            pixel_data_size = struct.unpack('<I', frame_header[12:16])[0]
-            
+        indexed = self.total_frames
+
+        for i in range(self.total_frames):
+            # 截斷檔防護: FrameHeader 放不下就停在這裡,只索引完整影格
+            if current_offset + V3_FRAME_HEADER_SIZE > file_size:
+                print(f"⚠️  影格 {i} 數據不完整，停止建立索引")
+                indexed = i
+                del offsets[i:]
+                break
+
+            offsets[i] = current_offset
+
+            slave_table_size, pixel_data_size = unpack_sizes(mm, current_offset + 8)
+
             current_offset += V3_FRAME_HEADER_SIZE + slave_table_size + pixel_data_size
+
+        # 完整掃描成功才寫側車索引 (截斷檔不寫,等差快速路徑不需要)
+        if indexed == self.total_frames:
+            try:
+                with open(idx_path, 'wb') as f:
+                    self.frame_offsets.tofile(f)
+            except OSError:
+                pass  # 目錄唯讀等情況,下次再重建
     
     # ==================== 層級 1: Frame 訪問 ====================
     
-    def get_frame(self, frame_id: int) -> Dict:
+    def _decode_frame(self, frame_id: int) -> FrameView:
         """
-        獲取完整影格資料
-        
-        返回:
-            {
-                'frame_id': int,
-                'timestamp_ms': float,
-                'slaves': List[Dict],  # 所有 Slave 元資料
-                'pixel_data': bytes    # 原始像素資料
-            }
+        獲取影格視圖 (實際解碼;對外請呼叫 get_frame)
+
+        只解析 FrameHeader;SlaveTable / PixelData 由 FrameView
+        延遲載入。回傳值可能被 LRU 快取共用,呼叫端不應修改。
         """
         if frame_id >= len(self.frame_offsets):
             raise ValueError(f"影格 {frame_id} 超出範圍 (總共 {len(self.frame_offsets)} 個)")
-        
-        self.file.seek(self.frame_offsets[frame_id])
-        
+
+        offset = self.frame_offsets[frame_id]
+
         # 讀取 FrameHeader [1]
-        frame_header = self.file.read(V3_FRAME_HEADER_SIZE)
-        actual_frame_id = struct.unpack('<I', frame_header[0:4])[0]
-        slave_table_size = struct.unpack('<I', frame_header[8:12])[0]
-        pixel_data_size = struct.unpack('<I', frame_header[12:16])[0]
-        
-        # 讀取 SlaveTable [1]
-        slave_table_data = self.file.read(slave_table_size)
-        slaves = []
-        for i in range(self.total_slaves):
-            offset = i * V3_SLAVE_ENTRY_SIZE
-            entry = slave_table_data[offset:offset + V3_SLAVE_ENTRY_SIZE]
-            
-            slaves.append({
-                'slave_id': entry[0],
-                'channel_start': struct.unpack('<H', entry[2:4])[0],
-                'channel_count': struct.unpack('<H', entry[4:6])[0],
-                'pixel_count': struct.unpack('<H', entry[6:8])[0],
-                'data_offset': struct.unpack('<I', entry[8:12])[0],
-                'data_length': struct.unpack('<I', entry[12:16])[0]
-            })
-        
-        # 讀取 PixelData [1]
-        pixel_data = self.file.read(pixel_data_size)
-        
-        return {
-            'frame_id': actual_frame_id,
-            'timestamp_ms': (actual_frame_id * 1000) / self.fps if self.fps > 0 else 0,
-            'slaves': slaves,
-            'pixel_data': pixel_data
-        }
+        actual_frame_id, slave_table_size, pixel_data_size = _FRAME_HDR.unpack_from(self.mm, offset)
+
+        table_start = offset + V3_FRAME_HEADER_SIZE
+        return FrameView(
+            self,
+            actual_frame_id,
+            (actual_frame_id * 1000) / self.fps if self.fps > 0 else 0,
+            table_start,
+            slave_table_size,
+            table_start + slave_table_size,
+            pixel_data_size,
+        )
     
+    def get_frames(self, frame_ids) -> List[FrameView]:
+        """
+        批次取得多張影格
+
+        先用 madvise(WILLNEED) 一次提示核心把所有目標頁抓進
+        page cache (冷快取隨機訪問時 I/O 得以併行),再逐張解碼。
+        """
+        n = len(self.frame_offsets)
+        if hasattr(self.mm, 'madvise'):
+            page = mmap.PAGESIZE
+            total = len(self.mm)
+            for fid in frame_ids:
+                if not 0 <= fid < n:
+                    continue
+                start = self.frame_offsets[fid]
+                end = self.frame_offsets[fid + 1] if fid + 1 < n else total
+                aligned = start - start % page
+                try:
+                    self.mm.madvise(mmap.MADV_WILLNEED, aligned, end - aligned)
+                except (OSError, ValueError):
+                    break  # 平台不支援就放棄提示,不影響結果
+        return [self.get_frame(fid) for fid in frame_ids]
+
+    def get_frame_range(self, start: int = 0, end: int = None) -> List[FrameView]:
+        """
+        批次解碼 [start, end) 的連續影格
+
+        與 get_frames 的零散清單不同,連續區間可以用一次
+        madvise(WILLNEED) 覆蓋整段位元組範圍,讓核心做單一大
+        循序讀取 (網路檔案系統上差距尤其大),之後就地逐格解碼。
+        """
+        n = len(self.frame_offsets)
+        if end is None or end > n:
+            end = n
+        if start < 0:
+            start = 0
+        if start >= end:
+            return []
+
+        lo = self.frame_offsets[start]
+        hi = self.frame_offsets[end] if end < n else len(self.mm)
+        if hasattr(self.mm, 'madvise'):
+            aligned = lo - lo % mmap.PAGESIZE
+            try:
+                self.mm.madvise(mmap.MADV_WILLNEED, aligned, hi - aligned)
+            except (OSError, ValueError):
+                pass  # 平台不支援就放棄提示,不影響結果
+        return [self.get_frame(fid) for fid in range(start, end)]
+
+    def iter_frames(self, start: int = 0):
+        """
+        循序播放用的影格疊代器 (背景執行緒預取)
+
+        背景執行緒提前解碼下一張影格放進小佇列,讓解碼/讀檔
+        與呼叫端的輸出 (SPI/GPIO) 重疊。mmap 唯讀,跨執行緒安全。
+        """
+        q = queue.Queue(maxsize=2)
+
+        def _worker():
+            try:
+                for fid in range(start, self.total_frames):
+                    q.put(self._decode_frame(fid))
+                q.put(None)  # 結束哨兵
+            except Exception as exc:
+                q.put(exc)
+
+        threading.Thread(target=_worker, daemon=True).start()
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
     # ==================== 層級 2: Slave 訪問 ====================
     
-    def get_slave_data(self, frame_data: Dict, slave_id: int) -> bytes:
+    def get_slave_data(self, frame_data: FrameView, slave_id: int) -> bytes:
         """
         從影格中提取指定 Slave 的原始資料
-        
-        返回: bytes (該 Slave 的所有像素資料)
+
+        返回: 該 Slave 所有像素資料的零拷貝 memoryview
         """
-        slave = next((s for s in frame_data['slaves'] if s['slave_id'] == slave_id), None)
-        if not slave:
-            raise ValueError(f"找不到 Slave {slave_id}")
-        
-        start = slave['data_offset']
-        end = start + slave['data_length']
+        if isinstance(frame_data, FrameView):
+            slave = None
+            # 常見情況 slave_id == 表序: O(1) 解析單筆 entry,不掃整張表
+            try:
+                candidate = frame_data.slave(slave_id)
+                if candidate.slave_id == slave_id:
+                    slave = candidate
+            except IndexError:
+                pass
+            if slave is None:
+                slave = frame_data.slaves_by_id.get(slave_id)
+            if slave is None:
+                raise ValueError(f"找不到 Slave {slave_id}")
+            start = slave.data_offset
+            end = start + slave.data_length
+        else:
+            # 舊版 dict 影格相容路徑
+            slave = next((s for s in frame_data['slaves'] if s['slave_id'] == slave_id), None)
+            if not slave:
+                raise ValueError(f"找不到 Slave {slave_id}")
+            start = slave['data_offset']
+            end = start + slave['data_length']
         return frame_data['pixel_data'][start:end]
     
-    def get_slave_leds(self, frame_data: Dict, slave_id: int) -> List[LED]:
+    def get_slave_leds(self, frame_data: Dict, slave_id: int):
         """
         從影格中提取指定 Slave 的所有 LED
-        
-        返回: List[LED]
+
+        返回: 有 NumPy 時為結構化陣列 (欄位 r/g/b/w,零拷貝視圖),
+              否則為 List[LED]
         """
-        slave_data = self.get_slave_data(frame_data, slave_id)
-        
+        return self._leds_from_data(self.get_slave_data(frame_data, slave_id))
+
+    def _leds_from_data(self, slave_data):
+        """原始 Slave 像素位元組 → LED 資料 (get_slave_leds 的轉換核心)"""
+        if np is not None:
+            count = len(slave_data) // V3_BYTES_PER_LED
+            if _unpack_leds_nb is not None:
+                # numba 核心回傳可寫複本 (呼叫端可就地改再送出)
+                arr = _unpack_leds_nb(np.frombuffer(slave_data, dtype=np.uint8))
+                return arr.view(_LED_DTYPE).reshape(count).view(np.recarray)
+            # 單一 ndarray 視圖取代逐顆 LED 物件配置
+            return np.frombuffer(slave_data, dtype=_LED_DTYPE,
+                                 count=count).view(np.recarray)
+
         leds = []
-        for i in range(0, len(slave_data), V3_BYTES_PER_LED):
-            if i + V3_BYTES_PER_LED <= len(slave_data):
-                leds.append(LED(
-                    r=slave_data[i],
-                    g=slave_data[i + 1],
-                    b=slave_data[i + 2],
-                    w=slave_data[i + 3]
-                ))
-        
+        append = leds.append  # 方法查找提到迴圈外
+        # 長度檢查提到迴圈外:只走整除 4 的範圍,內層免逐顆比較
+        for i in range(0, len(slave_data) & ~3, V3_BYTES_PER_LED):
+            append(LED(
+                r=slave_data[i],
+                g=slave_data[i + 1],
+                b=slave_data[i + 2],
+                w=slave_data[i + 3]
+            ))
+
         return leds
-    
+
+    def get_slave_leds_packed(self, frame_data: Dict, slave_id: int):
+        """
+        以 uint32 SWAR 形式提取指定 Slave 的所有 LED
+
+        每顆 LED 一個 (r<<24)|(g<<16)|(b<<8)|w 整數,用 unpack() 還原。
+        有 NumPy 時為 '>u4' 零拷貝視圖 (big-endian 對齊位移順序),
+        否則為 List[int]
+        """
+        slave_data = self.get_slave_data(frame_data, slave_id)
+
+        if np is not None:
+            count = len(slave_data) // V3_BYTES_PER_LED
+            return np.frombuffer(slave_data, dtype='>u4', count=count)
+
+        return [int.from_bytes(slave_data[i:i + 4], 'big')
+                for i in range(0, len(slave_data) & ~3, 4)]
+
+    def get_slave_leds_array(self, frame_data: Dict, slave_id: int):
+        """
+        以 (N, 4) uint8 陣列形式提取指定 Slave 的所有 LED
+
+        有 NumPy 時為 mmap 上的零拷貝視圖 (一塊連續緩衝,
+        取代 N 個 LED 物件配置;欄 0-3 依序為 R/G/B/W),
+        否則退回 List[Tuple[int, int, int, int]]
+        """
+        slave_data = self.get_slave_data(frame_data, slave_id)
+        count = len(slave_data) // V3_BYTES_PER_LED
+
+        if np is not None:
+            return np.frombuffer(slave_data, dtype=np.uint8,
+                                 count=count * V3_BYTES_PER_LED
+                                 ).reshape(-1, V3_BYTES_PER_LED)
+
+        return [tuple(slave_data[i:i + V3_BYTES_PER_LED])
+                for i in range(0, count * V3_BYTES_PER_LED, V3_BYTES_PER_LED)]
+
+    def get_slave_pixels_bytes(self, frame_data: Dict, slave_id: int,
+                               led_order: str = 'RGBW') -> bytes:
+        """
+        以指定通道順序輸出指定 Slave 的原始像素位元組 (硬體發送路徑)
+
+        led_order 是 'RGBW' 四字母的任意排列,例如 WS2812B 用 'GRBW'。
+        高速路徑完全繞過 LED 物件:有 NumPy 時整個 Slave 做一次
+        C 層欄位重排 (連續位元組 permute,可吃 SIMD),輸出可直接
+        餵 DMA 緩衝;無 NumPy 時單趟迴圈重排
+        """
+        slave_data = self.get_slave_data(frame_data, slave_id)
+        if led_order == 'RGBW':
+            return bytes(slave_data)  # 檔案本身就是 RGBW,免重排
+
+        if len(led_order) != V3_BYTES_PER_LED:
+            raise ValueError(f"無效的通道順序: {led_order!r}")
+        perm = tuple('RGBW'.index(c) for c in led_order)  # 錯字母會丟 ValueError
+
+        if np is not None:
+            arr = np.frombuffer(slave_data, dtype=np.uint8)
+            return arr.reshape(-1, V3_BYTES_PER_LED)[:, perm].tobytes()
+
+        out = bytearray(len(slave_data) & ~3)
+        p0, p1, p2, p3 = perm
+        for i in range(0, len(out), V3_BYTES_PER_LED):
+            out[i] = slave_data[i + p0]
+            out[i + 1] = slave_data[i + p1]
+            out[i + 2] = slave_data[i + p2]
+            out[i + 3] = slave_data[i + p3]
+        return bytes(out)
+
     # ==================== 層級 3: LED 訪問 ====================
     
     def get_led(self, frame_data: Dict, slave_id: int, led_index: int) -> LED:
@@ -206,17 +606,64 @@ class PXLDv3Decoder:
             w=slave_data[offset + 3]
         )
     
+    def render_apa102(self, frame_data: FrameView, slave_id: int,
+                      brightness: int = 31) -> bytes:
+        """
+        將指定 Slave 的像素直接轉成 APA102 線路格式
+        (每顆 LED: [0xE0|亮度, B, G, R],丟棄 W 通道)
+
+        單趟轉換整個 Slave,輸出是線路格式,供 SPI 原始寫出;
+        APA102.set_many 吃的是未轉換的 RGBW,請直接餵 get_slave_data
+        """
+        slave_data = self.get_slave_data(frame_data, slave_id)
+        hdr = 0xE0 | (brightness & 0x1F)
+
+        if np is not None:
+            src = np.frombuffer(slave_data, dtype=np.uint8)
+            src = src.reshape(-1, V3_BYTES_PER_LED)
+            out = np.empty_like(src)
+            out[:, 0] = hdr
+            out[:, 1] = src[:, 2]  # B
+            out[:, 2] = src[:, 1]  # G
+            out[:, 3] = src[:, 0]  # R
+            return out.tobytes()
+
+        out = bytearray(len(slave_data))
+        for i in range(0, len(slave_data) & ~3, 4):
+            out[i] = hdr
+            out[i + 1] = slave_data[i + 2]
+            out[i + 2] = slave_data[i + 1]
+            out[i + 3] = slave_data[i]
+        return bytes(out)
+
     # ==================== 便捷方法 ====================
     
+    def iter_slave_leds(self, frame_data: Dict):
+        """
+        逐一產出 (slave_id, LED 資料) 的疊代器
+
+        一次只需一個 Slave 的播放端 (逐 Slave 送 UDP/SPI) 用這個,
+        記憶體只佔最大的那個 Slave,不必一口氣實體化整格。
+        直接拿疊代中的 SlaveEntry 切資料,不再按 slave_id 重查一次表
+        """
+        pixel_data = frame_data['pixel_data']
+        for slave in frame_data['slaves']:
+            yield slave.slave_id, self._leds_from_data(
+                pixel_data[slave.data_offset:slave.data_offset + slave.data_length])
+
     def get_all_slaves(self, frame_data: Dict) -> Dict[int, List[LED]]:
-        """獲取影格中所有 Slave 的 LED 資料"""
-        return {
-            slave['slave_id']: self.get_slave_leds(frame_data, slave['slave_id'])
-            for slave in frame_data['slaves']
-        }
+        """獲取影格中所有 Slave 的 LED 資料 (需要整份 dict 時才用)"""
+        return dict(self.iter_slave_leds(frame_data))
     
     def close(self):
         """關閉檔案"""
+        if self.mm is not None:
+            if hasattr(self.mm, 'close'):  # 退回緩衝時是 bytearray,沒有 close
+                try:
+                    self.mm.close()
+                except BufferError:
+                    pass  # 外面還有零拷貝視圖,mmap 隨最後一個視圖釋放
+            self.mm = None
         if self.file:
             self.file.close()
     
@@ -242,9 +689,9 @@ if __name__ == "__main__":
         leds = decoder.get_slave_leds(frame, slave_id)
         print(f"\nSlave {slave_id} 共有 {len(leds)} 個 LED")
         
-        # 顯示前 10 個 LED
-        for i, led in enumerate(leds):
-            print(f"  LED {i}: {led.to_tuple()}")
+        # 顯示前 10 個 LED (逐顆 print 是示範碼最大的開銷,務必設上限)
+        for i, led in enumerate(leds[:10]):
+            print(f"  LED {i}: {tuple(led)}")
         
         # ===== 層級 3: 獲取特定 LED =====
         led_index = 5
@@ -5,270 +5,234 @@ PXLD v3 分離器 - 增加幀範圍控制
 風格: 分層訪問、類型提示、優雅錯誤處理
 """
 
-import struct
+import mmap
 import os
 from typing import Dict, List, Optional, BinaryIO, Generator, Tuple
-from dataclasses import dataclass
 from pathlib import Path
 import argparse
 
-# ==================== 常數 ====================
-V3_HEADER_SIZE = 64
-V3_FRAME_HEADER_SIZE = 32
-V3_SLAVE_ENTRY_SIZE = 24
-V3_BYTES_PER_LED = 4  # 固定 RGBW 4 bytes
-
-# ==================== 資料結構 ====================
-@dataclass
-class SlaveInfo:
-    """Slave 元數據"""
-    slave_id: int
-    channel_start: int
-    channel_count: int
-    pixel_count: int
-    data_offset: int
-    data_length: int
-    
-    def __repr__(self) -> str:
-        return f"Slave(id={self.slave_id}, pixels={self.pixel_count}, offset={self.data_offset})"
-
-@dataclass  
-class FrameData:
-    """影格數據容器"""
-    frame_id: int
-    timestamp_ms: float
-    slaves: List[SlaveInfo]
-    pixel_data: bytes
-    
-    def __repr__(self) -> str:
-        return f"Frame(id={self.frame_id}, slaves={len(self.slaves)}, data_size={len(self.pixel_data)})"
+# 解碼核心統一在 PXLDv3Decoder.py — Struct 常數、mmap/索引/快取
+# 只維護一份,這個模組只補分離流程需要的 API
+from PXLDv3Decoder import (
+    V3_HEADER_SIZE,
+    V3_FRAME_HEADER_SIZE,
+    V3_SLAVE_ENTRY_SIZE,
+    V3_BYTES_PER_LED,
+    FrameView,
+    PXLDv3Decoder as _BaseDecoder,
+    _FR_SIZES as _FR_SIZES_STRUCT,
+    _SLAVE_ENTRY as _SLAVE_ENTRY_STRUCT,
+    _Slave as SlaveInfo,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # 沒有 NumPy 時退回純 Python 路徑
+
+try:
+    import numba
+except ImportError:
+    numba = None  # 選配:有裝 numba 時範圍掃描走 JIT
+
+# 向後相容別名:舊版這裡自帶的影格容器即解碼器的 FrameView
+FrameData = FrameView
+
+if np is not None and numba is not None:
+    @numba.njit(cache=True)
+    def _extract_slave_ranges_nb(mm_u8, frame_offsets, slave_id, out_ranges):
+        # JIT 掃描:逐格讀 slave_table_size、走訪表、寫出
+        # (絕對偏移, 長度) 列;返回命中筆數
+        count = 0
+        for i in range(frame_offsets.shape[0]):
+            off = frame_offsets[i]
+            table_size = (mm_u8[off + 8] | (mm_u8[off + 9] << 8)
+                          | (mm_u8[off + 10] << 16) | (mm_u8[off + 11] << 24))
+            table_start = off + 32
+            for j in range(table_size // 24):
+                e = table_start + j * 24
+                if mm_u8[e] == slave_id:
+                    data_offset = (mm_u8[e + 8] | (mm_u8[e + 9] << 8)
+                                   | (mm_u8[e + 10] << 16) | (mm_u8[e + 11] << 24))
+                    data_length = (mm_u8[e + 12] | (mm_u8[e + 13] << 8)
+                                   | (mm_u8[e + 14] << 16) | (mm_u8[e + 15] << 24))
+                    out_ranges[count, 0] = table_start + table_size + data_offset
+                    out_ranges[count, 1] = data_length
+                    count += 1
+                    break
+        return count
+else:
+    _extract_slave_ranges_nb = None
+
+def _writev_all(fd: int, iov: List[memoryview]) -> None:
+    """
+    writev 到 iovec 全部送出為止
+
+    os.writev 可能短寫 (空間將盡、訊號中斷等),回傳值少於批次
+    總量時默默丟位元組;這裡依回傳值推進 iovec 續寫,寫不動
+    (回傳 0) 就拋 OSError,對齊緩衝 write 的失敗語意。
+    """
+    while iov:
+        n = os.writev(fd, iov)
+        if n <= 0:
+            raise OSError(f"writev 返回 {n}")
+        # 跳過已完整送出的視圖,部分送出的切掉前段續寫
+        while iov and n >= len(iov[0]):
+            n -= len(iov[0])
+            iov.pop(0)
+        if n:
+            iov[0] = iov[0][n:]
 
 # ==================== 核心解碼器 ====================
-class PXLDv3Decoder:
-    """PXLD v3 解碼器 - 三層訪問架構"""
-    
-    def __init__(self, filepath: str):
-        self.filepath = filepath
-        self.file = None
-        self.fps = 0
-        self.total_frames = 0
-        self.total_slaves = 0
-        self.total_pixels = 0
-        self.frame_offsets = []
-        
-        self._open_and_index()
-    
-    def _open_and_index(self) -> None:
-        """開啟檔案並建立索引"""
-        self.file = open(self.filepath, 'rb')
-        
-        # 讀取 FileHeader
-        header = self.file.read(V3_HEADER_SIZE)
-        
-        # 驗證 Magic
-        magic = header[0:4].decode('ascii')
-        if magic != 'PXLD':
-            raise ValueError(f"不是有效的 PXLD 檔案 (Magic: {magic})")
-        
-        # 解析 Header
-        major_version = header[4]
-        if major_version != 3:
-            raise ValueError(f"不支援版本 {major_version}, 僅支援 v3")
-        
-        self.fps = header[6]
-        self.total_slaves = struct.unpack('<H', header[7:9])[0]
-        self.total_frames = struct.unpack('<I', header[9:13])[0]
-        self.total_pixels = struct.unpack('<I', header[13:17])[0]
-        
-        # 建立影格索引
-        self._build_frame_index()
-        
-        print(f"✅ PXLD v3 解碼器初始化成功")
-        print(f"   檔案: {Path(self.filepath).name}")
-        print(f"   FPS: {self.fps}")
-        print(f"   總影格: {self.total_frames}")
-        print(f"   總 Slave: {self.total_slaves}")
-        print(f"   總 LED: {self.total_pixels}")
-    
-    def _build_frame_index(self) -> None:
-        """建立所有影格的偏移索引"""
-        self.frame_offsets = []
-        current_offset = V3_HEADER_SIZE
-        
-        for frame_id in range(self.total_frames):
-            self.frame_offsets.append(current_offset)
-            
-            # 讀取 FrameHeader 計算下一個影格位置
-            self.file.seek(current_offset)
-            frame_header = self.file.read(V3_FRAME_HEADER_SIZE)
-            
-            if len(frame_header) < V3_FRAME_HEADER_SIZE:
-                print(f"⚠️  影格 {frame_id} 數據不完整，停止建立索引")
-                break
-            
-            slave_table_size = struct.unpack('<I', frame_header[8:12])[0]
-            pixel_data_size = struct.unpack('<I', frame_header[12:16])[0]
-            
-            current_offset += V3_FRAME_HEADER_SIZE + slave_table_size + pixel_data_size
-    
-    # ==================== 層級 1: Frame 訪問 ====================
-    
-    def get_frame(self, frame_id: int) -> FrameData:
-        """
-        獲取完整影格資料
-        
-        參數:
-            frame_id: 影格索引 (0-based)
-            
-        返回:
-            FrameData: 影格數據容器
-        """
-        if frame_id >= len(self.frame_offsets):
-            raise ValueError(f"影格 {frame_id} 超出範圍 (總共 {len(self.frame_offsets)} 個)")
-        
-        self.file.seek(self.frame_offsets[frame_id])
-        
-        # 讀取 FrameHeader
-        frame_header = self.file.read(V3_FRAME_HEADER_SIZE)
-        actual_frame_id = struct.unpack('<I', frame_header[0:4])[0]
-        slave_table_size = struct.unpack('<I', frame_header[8:12])[0]
-        pixel_data_size = struct.unpack('<I', frame_header[12:16])[0]
-        
-        # 讀取 SlaveTable
-        slave_table_data = self.file.read(slave_table_size)
-        slaves = []
-        
-        for i in range(self.total_slaves):
-            offset = i * V3_SLAVE_ENTRY_SIZE
-            if offset + V3_SLAVE_ENTRY_SIZE > len(slave_table_data):
-                continue
-                
-            entry = slave_table_data[offset:offset + V3_SLAVE_ENTRY_SIZE]
-            
-            slaves.append(SlaveInfo(
-                slave_id=entry[0],
-                channel_start=struct.unpack('<H', entry[2:4])[0],
-                channel_count=struct.unpack('<H', entry[4:6])[0],
-                pixel_count=struct.unpack('<H', entry[6:8])[0],
-                data_offset=struct.unpack('<I', entry[8:12])[0],
-                data_length=struct.unpack('<I', entry[12:16])[0]
-            ))
-        
-        # 讀取 PixelData
-        pixel_data = self.file.read(pixel_data_size)
-        
-        return FrameData(
-            frame_id=actual_frame_id,
-            timestamp_ms=(actual_frame_id * 1000) / self.fps if self.fps > 0 else 0,
-            slaves=slaves,
-            pixel_data=pixel_data
-        )
-    
+class PXLDv3Decoder(_BaseDecoder):
+    """
+    PXLDv3Decoder 的分離器擴充
+
+    這個檔案原本內嵌一份近乎相同的解碼器;解析、索引、快取現在
+    全部繼承自 PXLDv3Decoder.py 的單一實作,這裡只補分離流程用的
+    範圍疊代、零拷貝快路徑與幾個便捷查詢。
+    """
+
     def iterate_frames(self, start_frame: int = 0, end_frame: Optional[int] = None) -> Generator[FrameData, None, None]:
         """
         迭代指定範圍內的影格 (生成器)
-        
+
         參數:
             start_frame: 起始影格索引 (包含，默認0)
             end_frame: 結束影格索引 (不包含，默認為總影格數)
-            
+
         返回:
             Generator[FrameData, None, None]: 影格數據生成器
         """
         if end_frame is None:
             end_frame = self.total_frames
-        
+
         # 驗證範圍
         if start_frame < 0 or start_frame >= self.total_frames:
             raise ValueError(f"起始影格 {start_frame} 超出範圍 (0-{self.total_frames-1})")
-        
+
         if end_frame < 0 or end_frame > self.total_frames:
             raise ValueError(f"結束影格 {end_frame} 超出範圍 (0-{self.total_frames})")
-        
+
         if start_frame >= end_frame:
             raise ValueError(f"起始影格 {start_frame} 必須小於結束影格 {end_frame}")
-        
+
         print(f"📊 處理影格範圍: {start_frame} - {end_frame} (共 {end_frame - start_frame} 個影格)")
-        
+
+        # 批次預讀:每 64 格用 madvise(WILLNEED) 一次提示核心抓整個窗口,
+        # 冷快取順序掃描時 I/O 佇列深度 > 1,讀檔與解碼重疊
+        mm = self.mm
+        offsets = self.frame_offsets
+        prefetch = hasattr(mm, 'madvise')
+        window = 64
+
         for frame_id in range(start_frame, end_frame):
+            if prefetch and (frame_id - start_frame) % window == 0:
+                first = offsets[frame_id]
+                last_id = min(frame_id + window, end_frame) - 1
+                end_off = (offsets[last_id + 1] if last_id + 1 < len(offsets)
+                           else len(mm))
+                aligned = first - first % mmap.PAGESIZE
+                try:
+                    mm.madvise(mmap.MADV_WILLNEED, aligned, end_off - aligned)
+                except (OSError, ValueError):
+                    prefetch = False  # 平台不支援就只提示一次
+
             try:
                 yield self.get_frame(frame_id)
             except Exception as e:
                 print(f"⚠️  跳過影格 {frame_id}: {e}")
                 break
-    
+
     # ==================== 層級 2: Slave 訪問 ====================
-    
-    def get_slave_data(self, frame_data: FrameData, slave_id: int) -> bytes:
+
+    def get_slave_view(self, frame_id: int, slave_id: int) -> memoryview:
         """
-        從影格中提取指定 Slave 的原始資料
-        
-        參數:
-            frame_data: 影格數據
-            slave_id: Slave ID
-            
-        返回:
-            bytes: 該 Slave 的所有像素資料
+        零拷貝快路徑: 直接取得指定影格中指定 Slave 的像素資料視圖
+
+        只解析 FrameHeader 與目標 SlaveEntry,不建影格/SlaveInfo
+        物件,回傳 mmap 上的 memoryview。單一 Slave 的提取迴圈用這個
+        取代 get_frame + get_slave_data。
         """
-        slave = next((s for s in frame_data.slaves if s.slave_id == slave_id), None)
-        if not slave:
-            raise ValueError(f"找不到 Slave {slave_id}")
-        
-        start = slave.data_offset
-        end = start + slave.data_length
-        
-        if end > len(frame_data.pixel_data):
+        if frame_id >= len(self.frame_offsets):
+            raise ValueError(f"影格 {frame_id} 超出範圍 (總共 {len(self.frame_offsets)} 個)")
+
+        mm = self.mm
+        offset = self.frame_offsets[frame_id]
+        slave_table_size, _ = _FR_SIZES_STRUCT.unpack_from(mm, offset + 8)
+        table_start = offset + V3_FRAME_HEADER_SIZE
+        unpack_entry = _SLAVE_ENTRY_STRUCT.unpack_from
+        n_entries = slave_table_size // V3_SLAVE_ENTRY_SIZE
+
+        # 常見情況 slave_id == 表序: O(1) 命中,不掃整張表
+        if 0 <= slave_id < n_entries:
+            entry = unpack_entry(mm, table_start + slave_id * V3_SLAVE_ENTRY_SIZE)
+            if entry[0] != slave_id:
+                entry = None
+        else:
+            entry = None
+
+        if entry is None:
+            for i in range(n_entries):
+                candidate = unpack_entry(mm, table_start + i * V3_SLAVE_ENTRY_SIZE)
+                if candidate[0] == slave_id:
+                    entry = candidate
+                    break
+            else:
+                raise ValueError(f"找不到 Slave {slave_id}")
+
+        start = table_start + slave_table_size + entry[4]
+        end = start + entry[5]
+        if end > len(mm):
+            # 截斷/壞表項: 切片會默默變短,這裡明確擋下讓呼叫端跳格
             raise ValueError(f"Slave {slave_id} 數據超出範圍")
-        
-        return frame_data.pixel_data[start:end]
-    
+        return memoryview(mm)[start:end]
+
+    def get_slave_bytes(self, frame_id: int, slave_id: int) -> bytes:
+        """
+        只讀取單一 Slave 的像素資料 (不碰整格 pixel_data)
+
+        get_slave_view 的 bytes 版本,給需要獨立緩衝的呼叫端;
+        熱迴圈請直接用 get_slave_view 保持零拷貝。
+        """
+        return bytes(self.get_slave_view(frame_id, slave_id))
+
     def get_slave_info(self, frame_data: FrameData, slave_id: int) -> Optional[SlaveInfo]:
         """
         獲取指定 Slave 的元數據
-        
+
         參數:
             frame_data: 影格數據
             slave_id: Slave ID
-            
+
         返回:
             Optional[SlaveInfo]: Slave元數據，如果找不到則返回None
         """
-        return next((s for s in frame_data.slaves if s.slave_id == slave_id), None)
-    
+        return frame_data.slaves_by_id.get(slave_id)
+
     # ==================== 便捷方法 ====================
-    
+
     def get_all_slaves_info(self, frame_data: FrameData) -> Dict[int, SlaveInfo]:
         """
         獲取影格中所有 Slave 的元數據
-        
+
         參數:
             frame_data: 影格數據
-            
+
         返回:
             Dict[int, SlaveInfo]: Slave ID 到 SlaveInfo 的映射
         """
-        return {slave.slave_id: slave for slave in frame_data.slaves}
-    
+        return frame_data.slaves_by_id
+
     def get_frame_range_info(self) -> Tuple[int, int, float]:
         """
         獲取影格範圍信息
-        
+
         返回:
             Tuple[int, int, float]: (總影格數, FPS, 總時長(秒))
         """
         total_duration = self.total_frames / self.fps if self.fps > 0 else 0
         return self.total_frames, self.fps, total_duration
-    
-    def close(self) -> None:
-        """關閉檔案"""
-        if self.file:
-            self.file.close()
-    
-    def __enter__(self):
-        return self
-    
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
 
 # ==================== 分離器 ====================
 class PXLDv3Splitter:
@@ -330,36 +294,110 @@ class PXLDv3Splitter:
         print(f"   影格範圍: {start_frame} - {end_frame} (共 {end_frame - start_frame} 個影格)")
         print(f"   輸出文件: {output_path.name}")
         
-        # 打開輸出文件
-        output_file = open(output_path, 'wb')
-        
+        # 打開輸出文件 (4 MiB 寫緩衝:預設 8 KiB 會讓小格資料頻繁觸發 flush)
+        output_file = open(output_path, 'wb', buffering=4 * 1024 * 1024)
+
         # 處理每個影格
         processed_frames = 0
         total_bytes = 0
         target_frames = end_frame - start_frame
-        
-        for frame_data in self.decoder.iterate_frames(start_frame, end_frame):
+
+        try:
+            # 預掃描:先收集並驗證整個範圍的 (偏移, 長度),全部合法
+            # 才允許核心態複製與無檢查熱迴圈;驗證不過 (截斷檔等)
+            # 走逐格容錯路徑
+            mm_size = len(self.decoder.mm)
+            ranges: Optional[List[Tuple[int, int]]] = []
             try:
-                # 提取 Slave 數據
-                slave_data = self.decoder.get_slave_data(frame_data, slave_id)
-                
-                # 寫入文件
-                output_file.write(slave_data)
-                
-                processed_frames += 1
-                total_bytes += len(slave_data)
-                
-                # 顯示進度
-                if target_frames >= 10 and processed_frames % (max(1, target_frames // 10)) == 0:
-                    progress = processed_frames / target_frames * 100
-                    print(f"   {progress:.0f}% 完成 ({processed_frames}/{target_frames})")
-                    
-            except Exception as e:
-                print(f"⚠️  影格 {frame_data.frame_id} 跳過: {e}")
-                continue
-        
-        # 關閉文件
-        output_file.close()
+                for abs_offset, length in self._iter_slave_ranges(
+                        slave_id, start_frame, end_frame):
+                    if abs_offset + length > mm_size:
+                        ranges = None  # 超界,走安全路徑
+                        break
+                    ranges.append((abs_offset, length))
+            except Exception:
+                ranges = None
+
+            # 優先走核心態複製 (Linux copy_file_range: 檔案→檔案不經使用者態)
+            result = None
+            if ranges is not None and hasattr(os, 'copy_file_range'):
+                result = self._split_kernel_copy(ranges, output_file)
+
+            if result is not None:
+                processed_frames, total_bytes = result
+            else:
+                # 零拷貝路徑:逐格取 memoryview 直接寫出,
+                # 不建 FrameData/SlaveInfo,也不複製整格像素資料
+                get_slave_view = self.decoder.get_slave_view
+
+                # 聚集寫出:攢滿一批視圖後用單次 writev 送出,
+                # 把每格一次的小 write 系統呼叫收斂成每批一次
+                use_writev = hasattr(os, 'writev')
+                out_fd = output_file.fileno() if use_writev else -1
+                iov: List[memoryview] = []
+                iov_bytes = 0
+                output_file.flush()
+
+                # 進度改用遞增計數器,熱迴圈不再每圈算一次模
+                progress_step = max(1, target_frames // 10)
+                next_report = progress_step if target_frames >= 10 else -1
+
+                if ranges is not None:
+                    mv = memoryview(self.decoder.mm)
+
+                    for abs_offset, length in ranges:
+                        slave_view = mv[abs_offset:abs_offset + length]
+
+                        # 寫入文件
+                        if use_writev:
+                            iov.append(slave_view)
+                            iov_bytes += length
+                            if len(iov) >= 128 or iov_bytes >= 4 * 1024 * 1024:
+                                _writev_all(out_fd, iov)
+                                iov_bytes = 0
+                        else:
+                            output_file.write(slave_view)
+
+                        processed_frames += 1
+                        total_bytes += length
+
+                        # 顯示進度
+                        if processed_frames == next_report:
+                            progress = processed_frames / target_frames * 100
+                            print(f"   {progress:.0f}% 完成 ({processed_frames}/{target_frames})")
+                            next_report += progress_step
+                else:
+                    # 安全路徑:外部輸入驗證不過時逐格處理、逐格容錯
+                    for frame_id in range(start_frame, end_frame):
+                        try:
+                            slave_view = get_slave_view(frame_id, slave_id)
+
+                            if use_writev:
+                                iov.append(slave_view)
+                                iov_bytes += len(slave_view)
+                                if len(iov) >= 128 or iov_bytes >= 4 * 1024 * 1024:
+                                    _writev_all(out_fd, iov)
+                                    iov_bytes = 0
+                            else:
+                                output_file.write(slave_view)
+
+                            processed_frames += 1
+                            total_bytes += len(slave_view)
+
+                            if processed_frames == next_report:
+                                progress = processed_frames / target_frames * 100
+                                print(f"   {progress:.0f}% 完成 ({processed_frames}/{target_frames})")
+                                next_report += progress_step
+
+                        except Exception as e:
+                            print(f"⚠️  影格 {frame_id} 跳過: {e}")
+                            continue
+
+                if iov:
+                    _writev_all(out_fd, iov)
+        finally:
+            # 關閉文件 (核心態複製中途失敗也不漏檔柄)
+            output_file.close()
         
         # 顯示統計信息
         print(f"\n✅ Slave {slave_id} 分離完成!")
@@ -376,17 +414,98 @@ class PXLDv3Splitter:
         
         return str(output_path)
     
+    def _split_kernel_copy(self, ranges: List[Tuple[int, int]],
+                           output_file: BinaryIO) -> Optional[Tuple[int, int]]:
+        """
+        用 os.copy_file_range 做核心態範圍複製 (不經使用者態緩衝)
+
+        ranges 是呼叫端預掃描驗證過的 (絕對偏移, 長度) 列,像素資料
+        由核心直接從輸入檔複製到輸出檔。檔案系統不支援時返回 None,
+        呼叫端退回一般讀寫路徑。
+
+        返回:
+            Optional[Tuple[int, int]]: (已處理影格數, 總位元組數)
+        """
+        in_fd = self.decoder.file.fileno()
+        out_fd = output_file.fileno()
+        copy_range = os.copy_file_range
+
+        processed = 0
+        total = 0
+        output_file.flush()  # 之後全走 fd,不能留緩衝資料
+
+        try:
+            for abs_offset, remaining in ranges:
+                while remaining:
+                    n = copy_range(in_fd, out_fd, remaining, abs_offset)
+                    if n == 0:
+                        raise OSError("copy_file_range 返回 0")
+                    abs_offset += n
+                    remaining -= n
+                    total += n
+                processed += 1
+        except OSError:
+            if processed == 0 and total == 0:
+                return None  # 檔案系統/平台不支援,改走一般路徑
+            raise
+
+        return processed, total
+
+    def _iter_slave_ranges(self, slave_id: int, start_frame: int,
+                           end_frame: int) -> Generator[Tuple[int, int], None, None]:
+        """
+        產生目標 Slave 每格的 (絕對偏移, 長度)
+
+        有 numba 時整批 JIT 掃描 (解析迴圈離開直譯器),
+        否則逐格用 Struct 解析。
+        """
+        decoder = self.decoder
+        mm = decoder.mm
+
+        if _extract_slave_ranges_nb is not None:
+            offsets = np.array(decoder.frame_offsets[start_frame:end_frame],
+                               dtype=np.int64)
+            mm_u8 = np.frombuffer(mm, dtype=np.uint8)
+            out_ranges = np.empty((offsets.shape[0], 2), dtype=np.int64)
+            count = _extract_slave_ranges_nb(mm_u8, offsets, slave_id, out_ranges)
+            for k in range(count):
+                yield int(out_ranges[k, 0]), int(out_ranges[k, 1])
+            return
+
+        unpack_sizes = _FR_SIZES_STRUCT.unpack_from
+        unpack_entry = _SLAVE_ENTRY_STRUCT.unpack_from
+
+        for frame_id in range(start_frame, end_frame):
+            offset = decoder.frame_offsets[frame_id]
+            slave_table_size, _ = unpack_sizes(mm, offset + 8)
+            table_start = offset + V3_FRAME_HEADER_SIZE
+
+            entry = None
+            for i in range(slave_table_size // V3_SLAVE_ENTRY_SIZE):
+                candidate = unpack_entry(mm, table_start + i * V3_SLAVE_ENTRY_SIZE)
+                if candidate[0] == slave_id:
+                    entry = candidate
+                    break
+            if entry is None:
+                print(f"⚠️  影格 {frame_id} 跳過: 找不到 Slave {slave_id}")
+                continue
+
+            yield table_start + slave_table_size + entry[4], entry[5]
+
     def split_all_slaves(self, output_dir: Optional[str] = None,
                         start_frame: int = 0,
-                        end_frame: Optional[int] = None) -> Dict[int, str]:
+                        end_frame: Optional[int] = None,
+                        workers: Optional[int] = None) -> Dict[int, str]:
         """
         分離所有 Slave 的數據（可指定幀範圍）
-        
+
         參數:
             output_dir: 輸出目錄 (可選)
             start_frame: 起始影格索引 (包含，默認0)
             end_frame: 結束影格索引 (不包含，默認為總影格數)
-            
+            workers: 並行行程數 (None/1 為單行程;0 表示用 CPU 核心數。
+                     每個 Slave 的輸入範圍與輸出檔各自獨立,可線性擴展)
+
         返回:
             Dict[int, str]: Slave ID 到輸出文件路徑的映射
         """
@@ -408,47 +527,78 @@ class PXLDv3Splitter:
         # 準備輸出文件
         input_stem = Path(self.decoder.filepath).stem
         output_paths = {}
-        
+        parallel = workers is not None and workers != 1
+
         for slave_id in range(self.decoder.total_slaves):
             # 如果有指定幀範圍，在文件名中加入範圍信息
             if start_frame != 0 or end_frame != self.decoder.total_frames:
                 range_suffix = f"_frames{start_frame}to{end_frame-1}"
             else:
                 range_suffix = ""
-                
+
             output_path = output_dir / f"{input_stem}_slave{slave_id}_raw{range_suffix}.bin"
-            self.output_files[slave_id] = open(output_path, 'wb')
+            if not parallel:
+                # 4 MiB 寫緩衝:~33 個輸出檔同時寫,縮減小塊 flush 次數
+                self.output_files[slave_id] = open(output_path, 'wb',
+                                                   buffering=4 * 1024 * 1024)
             output_paths[slave_id] = str(output_path)
-            
+
             print(f"   準備輸出 Slave {slave_id} → {output_path.name}")
-        
+
+        if parallel:
+            # 每個 Slave 的輸入位元組範圍與輸出檔彼此獨立
+            # (尷尬並行),各子行程自己 mmap 輸入檔,無共享狀態
+            from concurrent.futures import ProcessPoolExecutor
+
+            max_workers = min(workers if workers > 0 else (os.cpu_count() or 1),
+                              self.decoder.total_slaves)
+            print(f"\n🚀 並行處理所有 Slave ({max_workers} 個行程)...")
+
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(_extract_one, self.decoder.filepath,
+                                       slave_id, start_frame, end_frame,
+                                       output_paths[slave_id])
+                           for slave_id in output_paths]
+                for future in futures:
+                    future.result()  # 重新拋出子行程的例外
+
+            print(f"\n✅ 所有 Slave 分離完成!")
+            return output_paths
+
         print(f"\n🚀 開始處理所有 Slave...")
         
-        # 處理每個影格
+        # 處理每個影格 (熱迴圈:方法/寫入函數先綁成局部名,
+        # 免去每圈的屬性與 dict 查找)
         processed_frames = 0
         target_frames = end_frame - start_frame
-        
+        get_slave_data = self.decoder.get_slave_data
+        write_fns = {sid: f.write for sid, f in self.output_files.items()}
+        get_write = write_fns.get
+
+        # 進度改用遞增計數器,熱迴圈不再每圈算一次模
+        progress_step = max(1, target_frames // 10)
+        next_report = progress_step if target_frames >= 10 else -1
+
         for frame_data in self.decoder.iterate_frames(start_frame, end_frame):
             for slave_info in frame_data.slaves:
                 slave_id = slave_info.slave_id
-                
+
                 try:
-                    # 提取 Slave 數據
-                    slave_data = self.decoder.get_slave_data(frame_data, slave_id)
-                    
-                    # 寫入對應文件
-                    if slave_id in self.output_files:
-                        self.output_files[slave_id].write(slave_data)
-                        
+                    # 提取 Slave 數據並寫入對應文件
+                    write = get_write(slave_id)
+                    if write is not None:
+                        write(get_slave_data(frame_data, slave_id))
+
                 except Exception as e:
                     print(f"⚠️  影格 {frame_data.frame_id}, Slave {slave_id} 跳過: {e}")
             
             processed_frames += 1
-            
+
             # 顯示進度
-            if target_frames >= 10 and processed_frames % (max(1, target_frames // 10)) == 0:
+            if processed_frames == next_report:
                 progress = processed_frames / target_frames * 100
                 print(f"   {progress:.0f}% 完成 ({processed_frames}/{target_frames})")
+                next_report += progress_step
         
         # 關閉所有文件
         for slave_id, file_obj in self.output_files.items():
@@ -495,35 +645,72 @@ class PXLDv3Splitter:
             output_dir.mkdir(parents=True, exist_ok=True)
         
         print(f"\n🎬 分段提取: 幀 {start_frame} 到 {end_frame-1}")
-        
+
         # 分段處理（每100幀為一個文件，可根據需要調整）
         segment_size = 100
         segments = []
-        
+
         for segment_start in range(start_frame, end_frame, segment_size):
             segment_end = min(segment_start + segment_size, end_frame)
             segments.append((segment_start, segment_end))
-        
+
         results = {slave_id: [] for slave_id in range(self.decoder.total_slaves)}
-        
-        for segment_idx, (seg_start, seg_end) in enumerate(segments):
-            print(f"\n   處理段 {segment_idx+1}/{len(segments)}: 幀 {seg_start}-{seg_end-1}")
-            
-            # 為每個段創建獨立的分離器
+
+        # 影格單趟遞增走訪,段嚴格依序完成: 進入一段才開那一段的
+        # Slave 輸出檔,段結束立刻關閉 — 單趟不重掃的好處保留,
+        # 但同時開啟的 fd 與寫入緩衝永遠只有一段的量
+        input_stem = Path(self.decoder.filepath).stem
+        total_frames = self.decoder.total_frames
+
+        def open_segment(seg_idx: int) -> Dict[int, BinaryIO]:
+            seg_start, seg_end = segments[seg_idx]
             segment_output_dir = output_dir / f"segment_{seg_start:04d}_{seg_end-1:04d}"
             segment_output_dir.mkdir(exist_ok=True)
-            
-            # 分離這個段的所有Slave
-            segment_paths = self.split_all_slaves(
-                output_dir=str(segment_output_dir),
-                start_frame=seg_start,
-                end_frame=seg_end
-            )
-            
-            # 收集結果
-            for slave_id, path in segment_paths.items():
-                results[slave_id].append(path)
-        
+
+            if seg_start != 0 or seg_end != total_frames:
+                range_suffix = f"_frames{seg_start}to{seg_end-1}"
+            else:
+                range_suffix = ""
+
+            handles = {}
+            for slave_id in range(self.decoder.total_slaves):
+                output_path = segment_output_dir / \
+                    f"{input_stem}_slave{slave_id}_raw{range_suffix}.bin"
+                handles[slave_id] = open(output_path, 'wb',
+                                         buffering=4 * 1024 * 1024)
+                results[slave_id].append(str(output_path))
+            return handles
+
+        print(f"   共 {len(segments)} 段,單趟處理")
+
+        get_slave_data = self.decoder.get_slave_data
+        current_seg = 0
+        handles = open_segment(0)
+        try:
+            frame_id = start_frame
+            for frame_data in self.decoder.iterate_frames(start_frame, end_frame):
+                seg_idx = (frame_id - start_frame) // segment_size
+                if seg_idx != current_seg:
+                    for handle in handles.values():
+                        handle.close()
+                    current_seg = seg_idx
+                    handles = open_segment(seg_idx)
+
+                for slave_info in frame_data.slaves:
+                    slave_id = slave_info.slave_id
+                    try:
+                        handle = handles.get(slave_id)
+                        if handle is not None:
+                            handle.write(get_slave_data(frame_data, slave_id))
+                    except Exception as e:
+                        print(f"⚠️  影格 {frame_id}, Slave {slave_id} 跳過: {e}")
+
+                frame_id += 1
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+        print(f"\n✅ 分段提取完成: {end_frame - start_frame} 格 × {len(segments)} 段")
         return results
     
     def close(self) -> None:
@@ -532,6 +719,21 @@ class PXLDv3Splitter:
             if not file_obj.closed:
                 file_obj.close()
 
+def _extract_one(filepath: str, slave_id: int, start_frame: int,
+                 end_frame: int, output_path: str) -> str:
+    """
+    子行程工作函數: 各自開檔 mmap,提取單一 Slave
+
+    必須是模組頂層函數才能被 multiprocessing pickle。
+    """
+    with PXLDv3Decoder(filepath) as decoder:
+        splitter = PXLDv3Splitter(decoder)
+        try:
+            return splitter.split_single_slave(slave_id, output_path,
+                                               start_frame, end_frame)
+        finally:
+            splitter.close()
+
 # ==================== 驗證工具 ====================
 def verify_bin_file(filepath: str) -> Dict:
     """
@@ -797,11 +999,13 @@ if __name__ == "__main__":
                 print(f"\n🔧 使用分離器...")
                 splitter = PXLDv3Splitter(decoder)
 
+                half_frames = 10707 // 2  # 常數提到迴圈外,不必每圈重算
+
                 for i in range(33):
-                
+
                     # 分離單個Slave（幀範圍: 0-50）
                     print(f"\n🎯 分離幀 0-50:")
-                    output_path = splitter.split_single_slave(i, start_frame=0, end_frame=int(10707/2))
+                    output_path = splitter.split_single_slave(i, start_frame=0, end_frame=half_frames)
                     print(f"輸出文件: {output_path}")
                 
                 # # 分離單個Slave（幀範圍: 100-150）
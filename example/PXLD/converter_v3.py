@@ -9,12 +9,18 @@ PXLD v2 到 v3 格式轉換器 (完整修正版)
 """
 import struct
 import json
-import binascii
+import mmap
 import os
 import sys
+import zlib
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # 沒有 NumPy 時退回純 Python 路徑
+
 # ==================== 常數定義 ====================
 V2_HEADER_SIZE = 64
 V2_FRAME_SIZE = 32620
@@ -35,8 +41,12 @@ V3_MINOR_VERSION = 0
 V3_UDP_PORT = 4050
 V3_CHECKSUM_TYPE = 1
 
+# v2 標頭佈局,模組級預編譯一次:magic/major/minor/fps/total_slaves/
+# total_channels/total_pixels/udp_port,免去逐欄位 unpack 的格式重編譯與切片
+_V2_HEADER_STRUCT = struct.Struct('<4s4BIIH')
+
 # ==================== 資料結構 ====================
-@dataclass
+@dataclass(slots=True)
 class V2Header:
     magic: str
     major_version: int
@@ -49,20 +59,203 @@ class V2Header:
     
     @classmethod
     def from_bytes(cls, data: bytes) -> 'V2Header':
-        magic = data[0:4].decode('ascii', errors='ignore')
+        # 一次 unpack_from 取出全部欄位,免掉多次 struct.unpack 與中間切片
+        (magic, major_version, minor_version, fps, total_slaves,
+         total_channels, total_pixels, udp_port) = \
+            _V2_HEADER_STRUCT.unpack_from(data, 0)
+        magic = magic.decode('ascii', errors='ignore')
         if magic != 'PXLD':
             raise ValueError(f"無效的 PXLD 檔案")
         return cls(
             magic=magic,
-            major_version=data[4],
-            minor_version=data[5],
-            fps=data[6],
-            total_slaves=data[7],
-            total_channels=struct.unpack('<I', data[8:12])[0],
-            total_pixels=struct.unpack('<I', data[12:16])[0],
-            udp_port=struct.unpack('<H', data[16:18])[0]
+            major_version=major_version,
+            minor_version=minor_version,
+            fps=fps,
+            total_slaves=total_slaves,
+            total_channels=total_channels,
+            total_pixels=total_pixels,
+            udp_port=udp_port
         )
 
+# ==================== LED 類型分派表 ====================
+# 類型字串只在編譯計畫時查一次,換成整數 id 索引下面的轉換函數表,
+# 熱迴圈不再做字串比較
+TYPE_RGB = 0       # WS2812B / APA102C: 前三位元組照搬,W=0xFF
+TYPE_MONO = 1      # STANDARD_LED: 亮度存入 W
+TYPE_UNKNOWN = 2   # 未知類型: 全 0
+
+TYPE_IDS = {
+    'WS2812B': TYPE_RGB,
+    'APA102C': TYPE_RGB,
+    'STANDARD_LED': TYPE_MONO,
+}
+
+
+def _conv_rgb_into(src, src_off, n_src, dst, dst_off):
+    if n_src >= 3:
+        dst[dst_off] = src[src_off]
+        dst[dst_off + 1] = src[src_off + 1]
+        dst[dst_off + 2] = src[src_off + 2]
+    else:
+        dst[dst_off] = dst[dst_off + 1] = dst[dst_off + 2] = 0
+    dst[dst_off + 3] = 0xFF
+
+
+def _conv_mono_into(src, src_off, n_src, dst, dst_off):
+    dst[dst_off] = dst[dst_off + 1] = dst[dst_off + 2] = 0
+    dst[dst_off + 3] = src[src_off] if n_src >= 1 else 0
+
+
+def _conv_zero_into(src, src_off, n_src, dst, dst_off):
+    dst[dst_off] = dst[dst_off + 1] = 0
+    dst[dst_off + 2] = dst[dst_off + 3] = 0
+
+
+_CONVERTERS = (_conv_rgb_into, _conv_mono_into, _conv_zero_into)
+
+
+# ---- 整段 output 的塊轉換 (純 Python 路徑用) ----
+# 編譯計畫時依 (類型, bpp) 選好,整個 output 一次呼叫;
+# 最常見的彩色 bpp==3 另備 4 顆一組的展開版
+
+def _run_rgb3_block(src, s, count, bpp, dst, d):
+    """TYPE_RGB 且 bpp==3 專用: 4 顆展開,迴圈分派次數剩 1/4"""
+    for _ in range(count >> 2):
+        dst[d] = src[s]
+        dst[d + 1] = src[s + 1]
+        dst[d + 2] = src[s + 2]
+        dst[d + 3] = 0xFF
+        dst[d + 4] = src[s + 3]
+        dst[d + 5] = src[s + 4]
+        dst[d + 6] = src[s + 5]
+        dst[d + 7] = 0xFF
+        dst[d + 8] = src[s + 6]
+        dst[d + 9] = src[s + 7]
+        dst[d + 10] = src[s + 8]
+        dst[d + 11] = 0xFF
+        dst[d + 12] = src[s + 9]
+        dst[d + 13] = src[s + 10]
+        dst[d + 14] = src[s + 11]
+        dst[d + 15] = 0xFF
+        s += 12
+        d += 16
+    for _ in range(count & 3):  # 尾數
+        dst[d] = src[s]
+        dst[d + 1] = src[s + 1]
+        dst[d + 2] = src[s + 2]
+        dst[d + 3] = 0xFF
+        s += 3
+        d += 4
+
+
+def _run_rgb_block(src, s, count, bpp, dst, d):
+    if bpp >= 3:
+        for _ in range(count):
+            dst[d] = src[s]
+            dst[d + 1] = src[s + 1]
+            dst[d + 2] = src[s + 2]
+            dst[d + 3] = 0xFF
+            s += bpp
+            d += 4
+    else:
+        for _ in range(count):
+            dst[d] = dst[d + 1] = dst[d + 2] = 0
+            dst[d + 3] = 0xFF
+            d += 4
+
+
+def _run_mono_block(src, s, count, bpp, dst, d):
+    if bpp >= 1:
+        for _ in range(count):
+            dst[d] = dst[d + 1] = dst[d + 2] = 0
+            dst[d + 3] = src[s]
+            s += bpp
+            d += 4
+    else:
+        for _ in range(count):
+            dst[d] = dst[d + 1] = dst[d + 2] = dst[d + 3] = 0
+            d += 4
+
+
+def _run_zero_block(src, s, count, bpp, dst, d):
+    for _ in range(count):
+        dst[d] = dst[d + 1] = dst[d + 2] = dst[d + 3] = 0
+        d += 4
+
+
+_BLOCK_RUNNERS = (_run_rgb_block, _run_mono_block, _run_zero_block)
+
+
+@dataclass(slots=True)
+class SlavePlan:
+    """
+    單一 Slave 的預編譯轉換計畫
+
+    配置載入時編譯一次,影格迴圈只呼叫 apply():純 Python 路徑
+    走展平後的 layout,NumPy 路徑走預建的 gather/scatter 索引,
+    兩者都不再碰 config dict 或重算偏移
+    """
+    pixel_count: int
+    layout: List[Tuple[str, int, int, int]]  # (type, offset, count, bpp)
+    ops: Optional[List[Tuple]] = None        # (塊轉換函數, offset, count, bpp)
+    vec_ops: Optional[List[Tuple]] = None    # (type_id, src, dst, count, bpp)
+
+    def apply(self, v2_slave_data) -> Tuple[bytes, int]:
+        """套用計畫,回傳 (v3_data, pixel_count)"""
+        out = bytearray(self.pixel_count * V3_BYTES_PER_LED)
+        self.apply_into(v2_slave_data, memoryview(out))
+        return bytes(out), self.pixel_count
+
+    def apply_into(self, v2_slave_data, out) -> int:
+        """
+        就地套用計畫,寫入預配置的 out (memoryview),回傳 pixel_count
+
+        呼叫端保證 out 起始為全 0 且只由本計畫寫入:計畫沒索引到的
+        位元組 (STANDARD_LED 的 RGB、未知類型) 恆為 0,跨影格重用
+        同一塊緩衝不必逐影格歸零
+        """
+        if self.vec_ops is not None:
+            # 向量化路徑: 每個 output 的來源與目的都各自連續,整段
+            # reshape 成 (count, bpp)/(count, 4) 後做條帶拷貝 —— 兩次
+            # C 層 strided copy,比逐位元組 fancy-index 快得多
+            dst_all = np.frombuffer(out, dtype=np.uint8)
+            src_all = np.frombuffer(v2_slave_data, dtype=np.uint8)
+            for type_id, src_start, dst_start, count, bpp in self.vec_ops:
+                o = dst_all[dst_start:dst_start + count * V3_BYTES_PER_LED] \
+                    .reshape(-1, V3_BYTES_PER_LED)
+                if type_id == TYPE_RGB:
+                    if bpp >= 3:
+                        o[:, :3] = src_all[src_start:src_start + count * bpp] \
+                            .reshape(-1, bpp)[:, :3]
+                    else:
+                        o[:, :3] = 0  # 來源不足 (含尾端補 0 像素)
+                    o[:, 3] = 0xFF
+                elif type_id == TYPE_MONO:
+                    o[:, :3] = 0
+                    o[:, 3] = src_all[src_start:src_start + count * bpp] \
+                        .reshape(-1, bpp)[:, 0]
+                else:
+                    o[:] = 0
+            return self.pixel_count
+
+        # 純 Python 路徑 (MicroPython 主機): 每個 output 呼叫一次
+        # 編譯時選好的塊轉換 (bpp==3 彩色走 4 顆展開的專用版),
+        # 沒有逐顆函數分派也沒有字串比較
+        off = 0
+        for run_block, start_offset, count, bytes_per_pixel in self.ops:
+            run_block(v2_slave_data, start_offset, count,
+                      bytes_per_pixel, out, off)
+            off += count * V3_BYTES_PER_LED
+
+        # 超出來源範圍的像素填 0 (W=0xFF)
+        end = self.pixel_count * V3_BYTES_PER_LED
+        while off < end:
+            out[off:off + V3_BYTES_PER_LED] = b'\x00\x00\x00\xFF'
+            off += V3_BYTES_PER_LED
+
+        return self.pixel_count
+
+
 # ==================== 核心轉換器 ====================
 class PXLDv2ToV3Converter:
     def __init__(self, config_path: Optional[str] = None):
@@ -74,7 +267,11 @@ class PXLDv2ToV3Converter:
         }
         self.v2_total_pixels = 0
         self.v2_total_slaves = 0
-        
+        self._layout_cache = {}  # slave_id → 驗證過的輸出佈局 (每 Slave 解析一次)
+        self._slave_plans: Dict[int, SlavePlan] = {}  # slave_id → 預編譯轉換計畫
+        self._frame_out: Optional[bytearray] = None   # 整格輸出緩衝 (convert_file 配置)
+        self._frame_mv: Optional[memoryview] = None
+
         if config_path:
             self.load_slave_configs(config_path)
     
@@ -94,6 +291,10 @@ class PXLDv2ToV3Converter:
                         self.slave_configs[slave['slave_id']] = slave
             
             print(f"✅ 已載入 {len(self.slave_configs)} 個 Slave 配置")
+
+            # 配置一載入就把各 Slave 的轉換計畫編好,影格迴圈零重算
+            for slave_id in self.slave_configs:
+                self._slave_plans[slave_id] = self._compile_plan(slave_id)
             
             # 顯示配置詳情
             for slave_id, config in self.slave_configs.items():
@@ -143,7 +344,111 @@ class PXLDv2ToV3Converter:
         else:
             # 未知類型,返回全 0
             return bytes([0x00, 0x00, 0x00, 0x00])
-    
+
+    def convert_led_data_into(self, led_type: str, src, src_off: int,
+                              n_src: int, dst, dst_off: int):
+        """
+        convert_led_data 的就地版本
+
+        直接以偏移讀 src、寫 dst (memoryview),不為每顆 LED 切片
+        來源也不配置 4-byte bytes。n_src 為該顆 LED 可用的來源
+        位元組數;實作見模組級 _CONVERTERS 分派表
+        """
+        _CONVERTERS[TYPE_IDS.get(led_type, TYPE_UNKNOWN)](
+            src, src_off, n_src, dst, dst_off)
+
+    def _slave_layout(self, slave_id: int) -> List[Tuple[str, int, int, int]]:
+        """
+        取得該 Slave 驗證過的輸出佈局
+
+        config['outputs'] 的走訪、dict.get 與範圍檢查跨影格不變,
+        每個 Slave 只做一次並快取為 (type, data_offset, count,
+        bytes_per_pixel) 元組列表,熱迴圈直接疊代
+        """
+        layout = self._layout_cache.get(slave_id)
+        if layout is None:
+            layout = []
+            config = self.slave_configs[slave_id]
+            for output in config.get('outputs', []):
+                output_type = output.get('type', 'UNKNOWN')
+                count = output.get('count', 0)
+                data_offset = output.get('data_offset', 0)
+                bytes_per_pixel = output.get('bytes_per_pixel', 3)
+                end_offset = data_offset + count * bytes_per_pixel
+
+                # 範圍檢查 (只在建佈局時做一次,警告不再逐影格重複)
+                if end_offset > V2_CHANNELS_PER_SLAVE:
+                    print(f"⚠️  警告: Slave {slave_id} output '{output.get('label')}' 數據超出範圍")
+                    print(f"    data_offset={data_offset}, count={count}, bytes_per_pixel={bytes_per_pixel}")
+                    print(f"    預期: {data_offset}~{end_offset}, 實際可用: 0~{V2_CHANNELS_PER_SLAVE}")
+                    end_offset = min(end_offset, V2_CHANNELS_PER_SLAVE)
+                    actual_count = (end_offset - data_offset) // bytes_per_pixel
+                    print(f"    調整 LED 數量: {count} -> {actual_count}")
+                    count = actual_count
+
+                layout.append((output_type, data_offset, count, bytes_per_pixel))
+            self._layout_cache[slave_id] = layout
+        return layout
+
+    def _compile_plan(self, slave_id: int) -> SlavePlan:
+        """
+        編譯該 Slave 的轉換計畫 (每 Slave 一次)
+
+        有配置者直接採 _slave_layout 的驗證結果;無配置者展平為單一
+        APA102C 輸出加尾端補 0。有 NumPy 時另外把 convert_led_data
+        的逐顆分派攤平成 gather/scatter 索引:
+            src_idx: v2 資料中要搬的位元組偏移 (彩色取 RGB 三位元組,
+                     STANDARD_LED 取亮度位元組)
+            dst_idx: 這些位元組在 v3 輸出中的落點
+            w_pos:   固定寫 0xFF 的 W 通道位置
+        """
+        if slave_id in self.slave_configs:
+            layout = self._slave_layout(slave_id)
+            pixel_count = sum(count for _, _, count, _ in layout)
+        else:
+            # 無配置: 視為 3 bytes/pixel 的 RGB,apply 負責尾端補 0
+            pixel_count = self.calculate_slave_pixel_count(slave_id)
+            n_full = min(pixel_count, V2_CHANNELS_PER_SLAVE // 3)
+            layout = [('APA102C', 0, n_full, 3)]
+
+        plan = SlavePlan(pixel_count=pixel_count, layout=layout)
+
+        # 類型字串 → 塊轉換函數,每個 output 查一次表;
+        # 彩色 bpp==3 (最常見) 換成展開的專用快路徑
+        plan.ops = []
+        for output_type, start_offset, count, bytes_per_pixel in layout:
+            type_id = TYPE_IDS.get(output_type, TYPE_UNKNOWN)
+            if type_id == TYPE_RGB and bytes_per_pixel == 3:
+                run_block = _run_rgb3_block
+            else:
+                run_block = _BLOCK_RUNNERS[type_id]
+            plan.ops.append(
+                (run_block, start_offset, count, bytes_per_pixel))
+
+        if np is not None:
+            # 每個 output 一筆向量化區塊 (來源/目的皆連續);
+            # 亮度來源不足的單色輸出降級為全 0
+            vec_ops = []
+            base_px = 0
+            for output_type, start_offset, count, bytes_per_pixel in layout:
+                type_id = TYPE_IDS.get(output_type, TYPE_UNKNOWN)
+                if type_id == TYPE_MONO and bytes_per_pixel < 1:
+                    type_id = TYPE_UNKNOWN
+                if count > 0:
+                    vec_ops.append((type_id, start_offset,
+                                    base_px * V3_BYTES_PER_LED,
+                                    count, bytes_per_pixel))
+                base_px += count
+
+            # 尾端補 0 像素 (RGB=0, W=0xFF) 當成來源不足的 RGB 區塊
+            if base_px < pixel_count:
+                vec_ops.append((TYPE_RGB, 0, base_px * V3_BYTES_PER_LED,
+                                pixel_count - base_px, 0))
+
+            plan.vec_ops = vec_ops
+
+        return plan
+
     def calculate_slave_pixel_count(self, slave_id: int) -> int:
         """
         計算單個 Slave 的 LED 總數
@@ -172,83 +477,31 @@ class PXLDv2ToV3Converter:
                 # 回退到預設計算
                 return V2_CHANNELS_PER_SLAVE // 3
     
-    def convert_slave_data(self, v2_slave_data: bytes, slave_id: int) -> Tuple[bytes, int]:
+    def convert_slave_data(self, v2_slave_data: bytes, slave_id: int,
+                           out: Optional[memoryview] = None) -> Tuple[bytes, int]:
         """
         轉換單個 Slave 的資料從 v2 格式到 v3 格式
-        
+
         參數:
             v2_slave_data: v2 格式的 Slave 數據 (976 bytes)
             slave_id: Slave ID
-        
+            out: 可選的預配置輸出視圖;給定時就地寫入 (不配置新緩衝)
+
         返回:
             (v3_data, pixel_count): v3 格式數據和 LED 數量
+            (就地模式回傳 (out, pixel_count))
         """
         if len(v2_slave_data) != V2_CHANNELS_PER_SLAVE:
             raise ValueError(f"Slave {slave_id} 資料長度錯誤: {len(v2_slave_data)} != {V2_CHANNELS_PER_SLAVE}")
-        
-        if slave_id in self.slave_configs:
-            # 使用配置文件處理 [2]
-            config = self.slave_configs[slave_id]
-            v3_data = bytearray()
-            pixel_count = 0
-            
-            for output in config.get('outputs', []):
-                output_type = output.get('type', 'UNKNOWN')
-                count = output.get('count', 0)
-                data_offset = output.get('data_offset', 0)
-                bytes_per_pixel = output.get('bytes_per_pixel', 3)
-                
-                # 計算實際的數據範圍
-                start_offset = data_offset
-                end_offset = start_offset + (count * bytes_per_pixel)
-                
-                # 範圍檢查
-                if end_offset > len(v2_slave_data):
-                    print(f"⚠️  警告: Slave {slave_id} output '{output.get('label')}' 數據超出範圍")
-                    print(f"    data_offset={data_offset}, count={count}, bytes_per_pixel={bytes_per_pixel}")
-                    print(f"    預期: {start_offset}~{end_offset}, 實際可用: 0~{len(v2_slave_data)}")
-                    # 調整到可用範圍
-                    end_offset = min(end_offset, len(v2_slave_data))
-                    actual_count = (end_offset - start_offset) // bytes_per_pixel
-                    print(f"    調整 LED 數量: {count} -> {actual_count}")
-                    count = actual_count
-                
-                # 提取該 output 的原始數據
-                output_data = v2_slave_data[start_offset:end_offset]
-                
-                # 逐個 LED 轉換
-                for i in range(count):
-                    pixel_start = i * bytes_per_pixel
-                    pixel_end = pixel_start + bytes_per_pixel
-                    pixel_data = output_data[pixel_start:pixel_end]
-                    
-                    # 轉換為 v3 格式 (4 bytes RGBW)
-                    v3_pixel = self.convert_led_data(output_type, pixel_data)
-                    v3_data.extend(v3_pixel)
-                    pixel_count += 1
-                    
-            return bytes(v3_data), pixel_count
-        else:
-            # 沒有配置時的預設處理
-            # 根據計算出的 pixel_count 處理
-            pixel_count = self.calculate_slave_pixel_count(slave_id)
-            v3_data = bytearray()
-            
-            # 假設全部是 RGB LED (3 bytes per pixel)
-            for i in range(pixel_count):
-                start_offset = i * 3
-                end_offset = start_offset + 3
-                
-                if end_offset <= len(v2_slave_data):
-                    pixel_data = v2_slave_data[start_offset:end_offset]
-                    v3_pixel = self.convert_led_data('APA102C', pixel_data)
-                else:
-                    # 超出範圍,填充 0
-                    v3_pixel = bytes([0x00, 0x00, 0x00, 0xFF])
-                
-                v3_data.extend(v3_pixel)
-            
-            return bytes(v3_data), pixel_count
+
+        # 計畫在配置載入時已編好;無配置的 Slave 首次遇到時補編譯
+        plan = self._slave_plans.get(slave_id)
+        if plan is None:
+            plan = self._slave_plans[slave_id] = self._compile_plan(slave_id)
+
+        if out is not None:
+            return out, plan.apply_into(v2_slave_data, out)
+        return plan.apply(v2_slave_data)
     
     def convert_file(self, input_path: str, output_path: str, total_frames: Optional[int] = None) -> Dict:
         """轉換完整的 PXLD 檔案從 v2 到 v3"""
@@ -268,6 +521,11 @@ class PXLDv2ToV3Converter:
                 # 保存用於計算
                 self.v2_total_pixels = v2_header.total_pixels
                 self.v2_total_slaves = v2_header.total_slaves
+
+                # 無配置 Slave 的計畫依賴 v2 標頭的像素分配,換檔重編
+                for slave_id in list(self._slave_plans):
+                    if slave_id not in self.slave_configs:
+                        del self._slave_plans[slave_id]
                 
                 print(f"\n📄 輸入檔案資訊 (v2):")
                 print(f"   版本: {v2_header.major_version}.{v2_header.minor_version}")
@@ -288,6 +546,11 @@ class PXLDv2ToV3Converter:
                         print(f"    剩餘 {remaining} bytes 將被忽略")
                 
                 print(f"   總影格數: {total_frames}")
+
+                # 整個輸入檔 mmap 一次,之後影格全用偏移零拷貝切片,
+                # 免去逐影格 seek+read 的系統呼叫與 bytes 配置
+                mm_in = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+                mv_in = memoryview(mm_in)
                 
                 # ===== 計算每個 Slave 的 LED 數量 =====
                 slave_pixel_counts = []
@@ -322,10 +585,12 @@ class PXLDv2ToV3Converter:
                 
                 print(f"   v3 總通道數: {total_channels_v3} (每個 LED {V3_BYTES_PER_LED} 字節)")
                 
-                # ===== 第一步: 寫入所有資料 (CRC32 暫時為 0) =====
+                # ===== 第一步: 寫入所有資料 (標頭最後補寫) =====
                 print(f"\n🔄 開始轉換影格資料...")
-                with open(output_path, 'wb') as f_out:
-                    # 寫入 v3 標頭 (CRC32 暫時為 0) [1]
+                with open(output_path, 'w+b') as f_out:
+                    # 組好 v3 標頭,但先跳過標頭區直接串流影格資料,
+                    # 結尾帶著算好的 CRC 一次寫回 offset 0 —— 單一
+                    # 檔案控制代碼、單趟寫入,不再 r+b 重開補丁
                     header = bytearray(V3_HEADER_SIZE)
                     header[0:4] = V3_MAGIC                                          # offset 0-3: magic
                     header[4] = V3_MAJOR_VERSION                                    # offset 4: major_version
@@ -340,8 +605,19 @@ class PXLDv2ToV3Converter:
                     struct.pack_into('<I', header, 23, 0)                           # offset 23-26: crc32 (暫時為0)
                     header[27] = V3_CHECKSUM_TYPE                                   # offset 27: checksum_type
                     header[28:64] = bytes(36)                                       # offset 28-63: reserved
-                    f_out.write(header)
-                    
+
+                    # CRC32 隨寫隨算: 校驗範圍從 offset 27 起,先用標頭
+                    # 尾段 (checksum_type + reserved,內容已定) 起算,
+                    # 之後每個寫出緩衝累加,省掉寫完整檔重讀一遍的 I/O
+                    crc32_value = zlib.crc32(header[27:])
+
+                    def w(buf):
+                        nonlocal crc32_value
+                        crc32_value = zlib.crc32(buf, crc32_value)
+                        f_out.write(buf)
+
+                    f_out.seek(V3_HEADER_SIZE)  # 標頭區留空,最後回填
+
                     # 建立 SlaveEntry 列表
                     slave_entries = []
                     current_data_offset = 0
@@ -365,29 +641,67 @@ class PXLDv2ToV3Converter:
                         
                         current_data_offset += data_length
                         channel_start += channel_count
-                    
+
+                    # SlaveTable 跨影格不變,先串成單一 bytes;配合 writev
+                    # 把每格 1+33+1 次 write 收斂成一次系統呼叫
+                    slave_table_bytes = b''.join(slave_entries)
+                    use_writev = hasattr(os, 'writev')
+                    if use_writev:
+                        f_out.flush()  # 之後繞過緩衝層直接寫 fd
+                        out_fd = f_out.fileno()
+
+                    # 整格輸出緩衝只配置一次,各 Slave 依預算偏移就地寫入
+                    # (取代逐 Slave bytearray + extend 的重配置/複製),
+                    # 每格一次 f_out.write。緩衝起始全 0,SlavePlan 不索引
+                    # 的位元組恆為 0,跨影格重用免歸零
+                    slave_dst_offsets = [0]
+                    for pixel_count in slave_pixel_counts:
+                        slave_dst_offsets.append(
+                            slave_dst_offsets[-1] + pixel_count * V3_BYTES_PER_LED)
+                    self._frame_out = bytearray(total_channels_v3)
+                    self._frame_mv = memoryview(self._frame_out)
+
+                    # 批次預讀: 每 16 格用 madvise(WILLNEED) 提示核心把下
+                    # 一個視窗的輸入頁抓進來,讀取與轉換重疊、I/O 佇列
+                    # 深度 > 1,冷快取時不再逐格等缺頁
+                    prefetch = hasattr(mm_in, 'madvise')
+                    window = 16
+
                     # 轉換並寫入每個影格
                     for frame_id in range(total_frames):
                         try:
-                            # 讀取 v2 影格
-                            v2_frame_data = f_in.read(V2_FRAME_SIZE)
-                            if len(v2_frame_data) < V2_FRAME_SIZE:
-                                print(f"⚠️  影格 {frame_id} 資料不完整 ({len(v2_frame_data)} bytes),停止處理")
+                            if prefetch and frame_id % window == 0:
+                                first = data_start + frame_id * V2_FRAME_SIZE
+                                length = min(window * V2_FRAME_SIZE,
+                                             input_size - first)
+                                aligned = first - first % mmap.PAGESIZE
+                                try:
+                                    mm_in.madvise(mmap.MADV_WILLNEED, aligned,
+                                                  length + (first - aligned))
+                                except (OSError, ValueError):
+                                    prefetch = False  # 平台不支援就只提示一次
+                            # 讀取 v2 影格 (mmap 上的零拷貝視圖)
+                            frame_off = data_start + frame_id * V2_FRAME_SIZE
+                            if frame_off + V2_FRAME_SIZE > input_size:
+                                print(f"⚠️  影格 {frame_id} 資料不完整 ({input_size - frame_off} bytes),停止處理")
                                 break
+                            v2_frame_data = mv_in[frame_off:frame_off + V2_FRAME_SIZE]
                             
                             # 提取像素資料 (跳過 FrameHeader 和 SlaveHeader)
                             v2_pixel_data = v2_frame_data[V2_FRAME_HEADER_SIZE + V2_SLAVE_HEADER_SIZE:]
                             if len(v2_pixel_data) != V2_PIXEL_DATA_SIZE:
                                 raise ValueError(f"影格 {frame_id}: v2 像素資料長度錯誤")
                             
-                            # 建立 v3 PixelData
-                            v3_pixel_data = bytearray()
+                            # 建立 v3 PixelData (就地寫入預配置的整格緩衝)
+                            frame_mv = self._frame_mv
                             for slave_id in range(v2_header.total_slaves):
                                 slave_start = slave_id * V2_CHANNELS_PER_SLAVE
                                 slave_end = slave_start + V2_CHANNELS_PER_SLAVE
                                 v2_slave_data = v2_pixel_data[slave_start:slave_end]
-                                v3_slave_data, _ = self.convert_slave_data(v2_slave_data, slave_id)
-                                v3_pixel_data.extend(v3_slave_data)
+                                self.convert_slave_data(
+                                    v2_slave_data, slave_id,
+                                    out=frame_mv[slave_dst_offsets[slave_id]:
+                                                 slave_dst_offsets[slave_id + 1]])
                             
                             # 寫入 v3 FrameHeader [1]
                             frame_header = bytearray(V3_FRAME_HEADER_SIZE)
@@ -395,16 +709,22 @@ class PXLDv2ToV3Converter:
                             struct.pack_into('<H', frame_header, 4, 0)                                  # offset 4-5: reserved
                             struct.pack_into('<H', frame_header, 6, 0)                                  # offset 6-7: reserved
                             struct.pack_into('<I', frame_header, 8, len(slave_entries) * V3_SLAVE_ENTRY_SIZE)  # offset 8-11: slave_table_size
-                            struct.pack_into('<I', frame_header, 12, len(v3_pixel_data))                # offset 12-15: pixel_data_size
+                            struct.pack_into('<I', frame_header, 12, total_channels_v3)                 # offset 12-15: pixel_data_size
                             frame_header[16:32] = bytes(16)                                             # offset 16-31: reserved
-                            f_out.write(frame_header)
-                            
-                            # 寫入 SlaveTable
-                            for entry in slave_entries:
-                                f_out.write(entry)
-                            
-                            # 寫入 PixelData
-                            f_out.write(v3_pixel_data)
+
+                            # FrameHeader + SlaveTable + PixelData 一次聚集
+                            # 寫出 (CRC 照樣逐緩衝累加)
+                            if use_writev:
+                                crc32_value = zlib.crc32(frame_header, crc32_value)
+                                crc32_value = zlib.crc32(slave_table_bytes, crc32_value)
+                                crc32_value = zlib.crc32(self._frame_out, crc32_value)
+                                os.writev(out_fd, (frame_header,
+                                                   slave_table_bytes,
+                                                   self._frame_out))
+                            else:
+                                w(frame_header)
+                                w(slave_table_bytes)
+                                w(self._frame_out)
                             
                             self.stats['frames_converted'] += 1
                             
@@ -418,22 +738,20 @@ class PXLDv2ToV3Converter:
                             self.stats['errors'].append(error_msg)
                             print(f"❌ {error_msg}")
                             break
-                
-                print(f"\n🔐 計算 CRC32 校驗碼...")
-                
-                # ===== 第二步: 計算 CRC32 [1] =====
-                with open(output_path, 'rb') as f_crc:
-                    f_crc.seek(27)  # 從 offset 27 開始計算
-                    file_data_for_crc = f_crc.read()
-                    crc32_value = binascii.crc32(file_data_for_crc) & 0xFFFFFFFF
-                    print(f"   CRC32: 0x{crc32_value:08X}")
-                
-                # ===== 第三步: 更新標頭中的 CRC32 =====
-                with open(output_path, 'r+b') as f_update:
-                    f_update.seek(23)
-                    f_update.write(struct.pack('<I', crc32_value))
-                
-                print(f"✅ CRC32 校驗碼已寫入檔案標頭")
+
+                    # ===== 第二步: 回填標頭 (含寫入過程累加出的 CRC32) =====
+                    crc32_value &= 0xFFFFFFFF
+                    struct.pack_into('<I', header, 23, crc32_value)
+                    f_out.seek(0)
+                    f_out.write(header)
+
+                mv_in.release()
+                try:
+                    mm_in.close()
+                except BufferError:
+                    pass  # 殘留的零拷貝視圖隨 GC 釋放對映
+
+                print(f"\n🔐 CRC32: 0x{crc32_value:08X} (寫入時累加,隨標頭回填)")
                 
                 self.stats['output_size'] = os.path.getsize(output_path)
                     
@@ -1,11 +1,18 @@
 # gs4_animation_with_color_fade_dual_mode.py
 # 動畫播放 + 實時顏色漸變控制 + 雙模式循環（支援開機序列）
 import time
-import framebuf
 import math
+import micropython
+import struct
+import array
 from machine import SPI, Pin
 from TFT import *
 
+try:
+    import _thread
+except ImportError:
+    _thread = None  # 單核/無執行緒韌體退回同步載入
+
 # 顯示參數
 W, H = 160, 160
 
@@ -20,12 +27,21 @@ print(f"初始狀態: {'高電位' if control_gpio.value() else '低電位'}")
 # ============================================================
 # 可調節參數
 # ============================================================
-# 顏色漸變速度
+# 除錯輸出開關: 運行期的狀態列印 (GPIO 變化、模式切換、循環進入)
+# 全部掛在這裡;量產關閉,省掉 f-string 配置與 UART 阻塞
+DEBUG = False
+
+# 顏色漸變速度 (整數角度單位: 1 單位 = 1/256 圈 ≈ 0.0245 rad)
 COLOR_SPEED = {
-    1: 0.10,  # 高電位：綠色 → 紅色 的速度
-    0: 0.03   # 低電位：紅色 → 綠色 的速度
+    1: 4,  # 高電位：綠色 → 紅色 的速度 (≈ 原 0.10 rad/幀)
+    0: 1   # 低電位：紅色 → 綠色 的速度 (≈ 原 0.03 rad/幀)
 }
 
+# 256 項整數正弦查表: 角度計數器 (uint8) 直接查出紅色亮度,
+# 熱迴圈不再呼叫 math.sin 也不做浮點鉗位
+SIN_RED = bytes(int((math.sin(2 * math.pi * i / 256) + 1) * 127.5)
+                for i in range(256))
+
 # 動畫播放速度（幀延遲）
 ANIMATION_SPEED = 2  # 每2幀切換一次動畫（越小越快）
 MAX_ANIMATION_FRAMES = 720  # 最大動畫幀數
@@ -76,25 +92,37 @@ validate_mode_config()
 
 root_path = 'frame'
 
+# 幀檔名開機一次算好,熱路徑不再每幀做 f-string 格式化與配置
+FRAME_NAMES = [f"/{root_path}/{i:03d}.g4" for i in range(MAX_ANIMATION_FRAMES)]
+
 # ============================================================
 # 核心函數：生成GS4調色板
 # ============================================================
+# 16 階亮度 (gray<<4)|gray 跨呼叫不變,預先算成查表
+BRIGHTNESS = bytes((gray << 4) | gray for gray in range(16))
+
 def build_gs4_palette_big_endian(pal_buf, r_tint, g_tint, b_tint=0):
     """為GS4格式生成16色調色板"""
-    mv = memoryview(pal_buf)
-    
-    for gray in range(16):
-        brightness = (gray << 4) | gray
-        
-        r = (r_tint * brightness) >> 8
-        g = (g_tint * brightness) >> 8
-        b = (b_tint * brightness) >> 8
-        
-        color = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
-        
-        idx = gray * 2
-        mv[idx] = (color >> 8) & 0xFF
-        mv[idx + 1] = color & 0xFF
+    # 16 個 RGB565 一次以 big-endian 打包寫入,取代逐位元組
+    # 的 memoryview 指定 (每次呼叫省 32 次索引寫入)
+    struct.pack_into('>16H', pal_buf, 0, *[
+        ((((r_tint * b) >> 8) & 0xF8) << 8) |
+        ((((g_tint * b) >> 8) & 0xFC) << 3) |
+        (((b_tint * b) >> 8) >> 3)
+        for b in BRIGHTNESS])
+
+# 這支腳本的漸變恆為 green = 255 - red,整張調色板由 red 一個值
+# 決定;256 種情況開機展開成 32-byte 查表 (共 8 KB),換色時整塊
+# 複製即可,連 pack_into 都省下
+def _build_pal_lut():
+    lut = []
+    buf = bytearray(16 * 2)
+    for red in range(256):
+        build_gs4_palette_big_endian(buf, red, 255 - red)
+        lut.append(bytes(buf))
+    return lut
+
+PAL_LUT = _build_pal_lut()
 
 # ============================================================
 # 安全載入動畫幀
@@ -102,15 +130,24 @@ def build_gs4_palette_big_endian(pal_buf, r_tint, g_tint, b_tint=0):
 def load_animation_frame_safe(frame_path, frame_number, buffer, max_frames=100):
     """
     安全載入動畫幀
-    自動處理幀號邊界（循環播放）
+
+    前置條件: 呼叫端的幀號已經回繞在 [0, max_frames) 內
+    (狀態機的循環邏輯自行處理邊界,配置也經過 validate_mode_config),
+    熱路徑因此不取模;越界輸入仍會回繞以保住「safe」語意
     """
-    # 確保幀號在安全範圍內（0 到 max_frames-1）
-    safe_frame = frame_number % max_frames
-    
+    if 0 <= frame_number < max_frames:
+        safe_frame = frame_number
+    else:
+        safe_frame = frame_number % max_frames
+
     try:
-        # 生成文件名，例如：/000.g4, /001.g4, /002.g4
-        filename = f"/{frame_path}/{safe_frame:03d}.g4"
-        
+        # 文件名，例如：/000.g4, /001.g4, /002.g4
+        # (root_path 的檔名已在 FRAME_NAMES 預先生成)
+        if frame_path is root_path and safe_frame < len(FRAME_NAMES):
+            filename = FRAME_NAMES[safe_frame]
+        else:
+            filename = f"/{frame_path}/{safe_frame:03d}.g4"
+
         with open(filename, "rb") as f:
             bytes_read = f.readinto(buffer)
             
@@ -128,24 +165,36 @@ def load_animation_frame_safe(frame_path, frame_number, buffer, max_frames=100):
         create_error_frame(buffer, safe_frame)
         return safe_frame, False
 
-def create_error_frame(buffer, frame_number):
-    """創建錯誤提示圖像"""
-    # 創建棋盤格圖案
-    for i in range(len(buffer)):
+def _build_error_frame():
+    """棋盤格錯誤圖案只跟 W/H 有關,開機算一次存成常數"""
+    buf = bytearray((W * H + 1) // 2)
+    for i in range(len(buf)):
         x = (i * 2) % W
         y = (i * 2) // W
-        
+
         # 棋盤格效果
         if ((x // 8) + (y // 8)) % 2 == 0:
             gray = 0x0F  # 亮色
         else:
             gray = 0x01  # 暗色
-        
-        # 添加幀號標記
-        if x < 16 and y < 16:
-            gray = (frame_number % 16)  # 左上角顯示幀號
-        
-        buffer[i] = (gray << 4) | gray
+
+        buf[i] = (gray << 4) | gray
+    return bytes(buf)
+
+ERROR_FRAME = _build_error_frame()
+
+def create_error_frame(buffer, frame_number):
+    """創建錯誤提示圖像"""
+    # 整塊複製預建的棋盤格,取代逐位元組重算
+    buffer[:] = ERROR_FRAME
+
+    # 左上角 16×16 顯示幀號 (唯一隨呼叫變動的部分)
+    gray = frame_number % 16
+    marker = bytes([(gray << 4) | gray]) * 8  # 16 像素 = 8 位元組
+    row_bytes = W // 2
+    for y in range(16):
+        offset = y * row_bytes
+        buffer[offset:offset + 8] = marker
 
 # ============================================================
 # 動畫狀態機（支援開機序列）
@@ -157,7 +206,11 @@ class AnimationStateMachine:
         self.mode_config = mode_config
         self.current_mode = initial_mode
         self.is_first_run = True  # 是否是首次運行（開機序列）
-        
+
+        # 預計算各模式循環長度,循環中換幀收斂成單一取模
+        for cfg in mode_config.values():
+            cfg['_loop_len'] = cfg['loop_end'] - cfg['loop_start'] + 1
+
         # 開機時，如果有boot_start就使用，否則使用start
         config = mode_config[initial_mode]
         if self.is_first_run and config.get('boot_start') is not None:
@@ -169,47 +222,61 @@ class AnimationStateMachine:
         
         self.in_loop = False  # 是否在循環播放中
         self.direction = 1  # 播放方向: 1=正向
-        
+        self._rebind_cfg()
+
         print(f"動畫狀態機初始化: 模式={self.current_mode}, 起始幀={self.current_frame}")
-    
+
+    def _rebind_cfg(self):
+        """把當前模式設定攤平成實例屬性,熱路徑免逐次字典查找"""
+        cfg = self.mode_config[self.current_mode]
+        self._loop_start = cfg['loop_start']
+        self._loop_end = cfg['loop_end']
+        self._loop_len = cfg['_loop_len']
+
     def update_frame(self):
         """更新當前幀號，根據模式進行循環"""
-        config = self.mode_config[self.current_mode]
-        
+        # 已經在循環中: 無分支取模回繞 (免掉範圍比較與回繞列印)
+        if self.in_loop:
+            ls = self._loop_start
+            self.current_frame = ls + (
+                (self.current_frame - ls + self.direction) % self._loop_len)
+            return self.current_frame
+
         # 計算下一幀
         next_frame = self.current_frame + self.direction
-        
-        # 判斷是否已經在循環中
-        if self.in_loop:
-            # 已經在循環中，檢查是否超出loop範圍
-            if next_frame > config['loop_end']:
-                # 超出loop_end，回到loop_start
-                next_frame = config['loop_start']
-                print(f"[循環] 模式{self.current_mode}: 到達loop_end({config['loop_end']})，跳轉到loop_start({config['loop_start']})")
-            
-            elif next_frame < config['loop_start']:
-                # 低於loop_start（理論上不會發生，因為direction=1）
-                next_frame = config['loop_start']
-                print(f"[循環] 模式{self.current_mode}: 低於loop_start，回到{config['loop_start']}")
-        
-        else:
-            # 還在首次播放中（開機序列或切換後的過渡）
-            if next_frame >= config['loop_start']:
-                # 到達或超過loop_start，進入循環模式
-                self.in_loop = True
-                self.is_first_run = False  # 關閉開機標記
-                
-                # 如果超過loop_end，立即回到loop_start
-                if next_frame > config['loop_end']:
-                    next_frame = config['loop_start']
-                    print(f"[進入循環] 模式{self.current_mode}: 超過loop_end，直接進入循環 {config['loop_start']}")
-                else:
-                    print(f"[進入循環] 模式{self.current_mode}: 到達loop_start({config['loop_start']})，開始循環播放")
-                    print(f"  循環範圍: {config['loop_start']}-{config['loop_end']}")
-        
+
+        # 還在首次播放中（開機序列或切換後的過渡）
+        if next_frame >= self._loop_start:
+            # 到達或超過loop_start，進入循環模式
+            self.in_loop = True
+            self.is_first_run = False  # 關閉開機標記
+
+            # 如果超過loop_end，立即回到loop_start
+            if next_frame > self._loop_end:
+                next_frame = self._loop_start
+                if DEBUG:
+                    print(f"[進入循環] 模式{self.current_mode}: 超過loop_end，直接進入循環 {self._loop_start}")
+            elif DEBUG:
+                print(f"[進入循環] 模式{self.current_mode}: 到達loop_start({self._loop_start})，開始循環播放")
+                print(f"  循環範圍: {self._loop_start}-{self._loop_end}")
+
         self.current_frame = next_frame
         return self.current_frame
-    
+
+    def peek_next_frame(self):
+        """預看下一幀號 (不改變狀態,供背景預載用)"""
+        next_frame = self.current_frame + self.direction
+
+        if self.in_loop:
+            ls = self._loop_start
+            next_frame = ls + (
+                (self.current_frame - ls + self.direction) % self._loop_len)
+        elif (next_frame >= self._loop_start and
+                next_frame > self._loop_end):
+            next_frame = self._loop_start
+
+        return next_frame
+
     def switch_mode(self, new_mode):
         """切換到新模式"""
         if new_mode == self.current_mode:
@@ -224,24 +291,25 @@ class AnimationStateMachine:
         self.in_loop = False  # 重置循環狀態
         self.is_first_run = False  # 切換模式後不算首次運行
         self.direction = 1  # 重置為正向播放
-        
-        print(f"\n{'='*50}")
-        print(f"模式切換: {old_mode} → {new_mode}")
-        print(f"  跳轉到幀: {self.current_frame}")
-        print(f"  目標循環範圍: {config['loop_start']}-{config['loop_end']}")
-        print(f"{'='*50}\n")
+        self._rebind_cfg()
+
+        if DEBUG:
+            print(f"\n{'='*50}")
+            print(f"模式切換: {old_mode} → {new_mode}")
+            print(f"  跳轉到幀: {self.current_frame}")
+            print(f"  目標循環範圍: {self._loop_start}-{self._loop_end}")
+            print(f"{'='*50}\n")
         
         return True
     
     def get_mode_info(self):
         """獲取當前模式信息"""
-        config = self.mode_config[self.current_mode]
         return {
             'mode': self.current_mode,
             'frame': self.current_frame,
             'in_loop': self.in_loop,
             'is_first_run': self.is_first_run,
-            'loop_range': (config['loop_start'], config['loop_end']),
+            'loop_range': (self._loop_start, self._loop_end),
             'direction': self.direction
         }
 
@@ -267,12 +335,132 @@ tft.set_window(0, 0, W - 1, H - 1)
 # ============================================================
 # 創建緩衝區
 # ============================================================
-gs4_buf = bytearray((W * H + 1) // 2)
-gs4_fb = framebuf.FrameBuffer(gs4_buf, W, H, framebuf.GS4_HMSB)
+# GS4 幀緩衝一對: 顯示一塊,背景執行緒往另一塊預載下一幀,
+# 檔案 I/O 與 blit+SPI 推屏重疊
+gs4_bufs = (bytearray((W * H + 1) // 2), bytearray((W * H + 1) // 2))
+display_idx = 0
 rgb_buf = bytearray(W * H * 2)
-rgb_fb = framebuf.FrameBuffer(rgb_buf, W, H, framebuf.RGB565)
 pal_buf = bytearray(16 * 2)
-pal_fb = framebuf.FrameBuffer(pal_buf, 16, 1, framebuf.RGB565)
+
+# ============================================================
+# GS4 → RGB565 直查表展開 (取代 framebuf.blit 的逐像素調色板查找)
+# ============================================================
+# 一個 GS4 位元組是兩顆像素,直接查 256 項 × 4 位元組的表,
+# 一次 32 位元寫出兩顆 RGB565;viper 內迴圈一位元組一次存取
+_GS4_N = (W * H) // 2          # GS4 位元組數 = 輸出 u32 數
+BYTE_LUT = bytearray(256 * 4)  # 調色板變更時重建 (1 KB)
+
+@micropython.viper
+def rebuild_byte_lut(pal: ptr16, lut: ptr16):
+    """依當前 pal_buf 重建 GS4位元組 → 兩顆RGB565 的直查表 (viper)
+
+    調色板項整顆 u16 搬移,位元組序跟著 pal_buf 走;256 項的
+    重建迴圈從位元組級 Python 迴圈降到原生整數迴圈。
+    """
+    for v in range(256):
+        lut[v * 2] = pal[v >> 4]        # 高 nibble = 左像素
+        lut[v * 2 + 1] = pal[v & 0x0F]
+
+@micropython.viper
+def expand_gs4(src: ptr8, dst: ptr32, n: int, lut: ptr32):
+    """每個 GS4 位元組查表後以單一 u32 寫出兩顆像素"""
+    for i in range(n):
+        dst[i] = lut[src[i]]
+
+# ============================================================
+# 熱迴圈整數核心 (viper tick)
+# ============================================================
+# 每幀的純整數工作 (角度步進、正弦查表、動畫計數) 集中到一個
+# viper 函數;狀態打包成 array('i'),以 ptr32 原生讀寫,外層
+# Python 只剩檔案 I/O、調色板複製與 SPI 推屏
+
+# state 佈局 (array('i') 索引)
+_ST_ANGLE = 0     # 當前角度 (uint8 值域)
+_ST_TARGET = 1    # 目標角度
+_ST_SPEED = 2     # 漸變速度 (單位/幀)
+_ST_MOVING = 3    # 1 = 漸變中
+_ST_ANIM_CNT = 4  # 動畫幀計數器
+_ST_ANIM_SPD = 5  # 每幾幀換一次動畫
+_ST_RED = 6       # 查表出的紅色亮度
+
+# tick() 回傳的事件旗標
+TICK_COLOR = 1    # 顏色變了,要換調色板
+TICK_ADVANCE = 2  # 該換下一張動畫幀
+TICK_REACHED = 4  # 漸變剛到達目標
+
+@micropython.viper
+def tick(state: ptr32, sin_lut: ptr8) -> int:
+    """單幀整數核心: 角度步進 + 正弦查表 + 動畫計數,回傳事件旗標"""
+    flags = 0
+
+    # 顏色漸變 (8 位元帶號回繞差即最短路徑)
+    if state[3]:
+        cur = state[0]
+        target = state[1]
+        speed = state[2]
+        diff = (target - cur) & 0xFF
+        if diff > 128:
+            diff -= 256
+        if diff > speed or diff < 0 - speed:
+            if diff > 0:
+                cur = (cur + speed) & 0xFF
+            else:
+                cur = (cur - speed) & 0xFF
+        else:
+            cur = target
+            state[3] = 0
+            flags = 4      # TICK_REACHED
+        state[0] = cur
+        state[6] = sin_lut[cur]
+        flags |= 1         # TICK_COLOR
+
+    # 動畫計數
+    cnt = state[4] + 1
+    if cnt >= state[5]:
+        cnt = 0
+        flags |= 2         # TICK_ADVANCE
+    state[4] = cnt
+    return flags
+
+# ============================================================
+# 背景預載執行緒 (雙緩衝)
+# ============================================================
+_pending = None  # 待載入 (幀號, 緩衝索引)
+_ready = None    # 已完成 (幀號, 緩衝索引)
+_buf_lock = _thread.allocate_lock() if _thread else None
+
+def _loader_thread():
+    """信箱式載入迴圈: 取 _pending、載入背面緩衝、放 _ready"""
+    global _pending, _ready
+    while True:
+        _buf_lock.acquire()
+        req = _pending
+        _pending = None
+        _buf_lock.release()
+
+        if req is None:
+            time.sleep_ms(2)
+            continue
+
+        frame_number, buf_idx = req
+        loaded_frame, _ = load_animation_frame_safe(
+            root_path, frame_number, gs4_bufs[buf_idx], MAX_ANIMATION_FRAMES)
+
+        _buf_lock.acquire()
+        _ready = (loaded_frame, buf_idx)
+        _buf_lock.release()
+
+_prefetch_enabled = _thread is not None
+if _prefetch_enabled:
+    _thread.start_new_thread(_loader_thread, ())
+    print("背景預載執行緒已啟動 (雙緩衝)")
+
+def request_prefetch(frame_number, buf_idx):
+    """請求背景載入 frame_number 到指定緩衝"""
+    global _pending
+    _buf_lock.acquire()
+    _pending = (frame_number, buf_idx)
+    _buf_lock.release()
 
 # ============================================================
 # 初始化狀態
@@ -285,14 +473,34 @@ last_gpio_state = gpio_state
 initial_mode = gpio_state  # 0=低電位, 1=高電位
 anim_sm = AnimationStateMachine(MODE_CONFIG, initial_mode=initial_mode)
 
-# 顏色漸變狀態
-current_angle = math.pi/2 if gpio_state else 3*math.pi/2  # 根據GPIO初始狀態
+# 熱迴圈用到的方法預先綁定一次,模組屬性查找收斂成單一名稱載入
+_ticks_ms = time.ticks_ms
+_ticks_diff = time.ticks_diff
+_read_gpio = control_gpio.value
+_tick = tick
+_expand = expand_gs4
+_write = tft.write_data
+
+# 顏色漸變狀態 (整數角度: 64 = π/2 = 紅, 192 = 3π/2 = 綠)
+ANGLE_RED = 64
+ANGLE_GREEN = 192
+ANGLE_TARGETS = (ANGLE_GREEN, ANGLE_RED)  # 以 gpio_state 索引,免分支
+current_angle = ANGLE_TARGETS[gpio_state]  # 根據GPIO初始狀態
 current_speed = COLOR_SPEED[gpio_state]
-is_moving = False  # 初始已到達目標
 
-# 動畫播放狀態
-animation_counter = 0
-animation_speed = ANIMATION_SPEED
+# 熱迴圈整數狀態集中到 array('i'),tick() 以 ptr32 直接讀寫
+state = array.array('i', [
+    current_angle,    # _ST_ANGLE
+    current_angle,    # _ST_TARGET (初始已到達目標)
+    current_speed,    # _ST_SPEED
+    0,                # _ST_MOVING
+    0,                # _ST_ANIM_CNT
+    ANIMATION_SPEED,  # _ST_ANIM_SPD
+    0,                # _ST_RED (下面算初始顏色)
+])
+
+# 調色板快取鍵: red 沒變就不重建 (green 恆為 255-red,見 PAL_LUT)
+last_pal_key = None
 
 # 性能監控
 frames = 0
@@ -319,18 +527,20 @@ for mode_id, config in MODE_CONFIG.items():
         print(f"  切換起點: {config['start']} → {config['loop_start']}")
     print(f"  循環範圍: {config['loop_start']} - {config['loop_end']}")
 
-print(f"\n顏色速度: {current_speed:.3f}")
-print(f"動畫速度: 每{animation_speed}幀切換")
+print(f"\n顏色速度: {current_speed} 單位/幀")
+print(f"動畫速度: 每{ANIMATION_SPEED}幀切換")
 
 # 載入初始動畫幀
-load_animation_frame_safe(root_path, anim_sm.current_frame, gs4_buf, MAX_ANIMATION_FRAMES)
+load_animation_frame_safe(root_path, anim_sm.current_frame, gs4_bufs[display_idx], MAX_ANIMATION_FRAMES)
+
+# 預載下一幀到背面緩衝
+if _prefetch_enabled:
+    request_prefetch(anim_sm.peek_next_frame(), 1 - display_idx)
 
-# 計算初始顏色
-sin_val = math.sin(current_angle)
-red = int((sin_val + 1) * 127.5)
+# 計算初始顏色 (查表)
+red = SIN_RED[current_angle]
 green = 255 - red
-red = max(0, min(255, red))
-green = max(0, min(255, green))
+state[_ST_RED] = red
 print(f"初始顏色: 紅={red:3d}, 綠={green:3d}")
 
 # ============================================================
@@ -340,7 +550,7 @@ while True:
     # ======================================================
     # 1. 讀取GPIO狀態並切換模式
     # ======================================================
-    gpio_state = control_gpio.value()
+    gpio_state = _read_gpio()
     
     # 如果GPIO狀態改變，切換模式
     if gpio_state != last_gpio_state:
@@ -349,108 +559,102 @@ while True:
         # 切換模式 (0=低電位, 1=高電位)
         new_mode = gpio_state
         if anim_sm.switch_mode(new_mode):
-            # 載入新模式的第一幀
+            # 載入新模式的第一幀 (同步;預載的幀號已不適用)
             load_animation_frame_safe(
-                root_path, 
-                anim_sm.current_frame, 
-                gs4_buf, 
+                root_path,
+                anim_sm.current_frame,
+                gs4_bufs[display_idx],
                 MAX_ANIMATION_FRAMES
             )
-        
+            if _prefetch_enabled:
+                request_prefetch(anim_sm.peek_next_frame(), 1 - display_idx)
+
         # 更新顏色漸變目標和速度
-        target_angle = math.pi/2 if gpio_state else 3*math.pi/2
         current_speed = COLOR_SPEED[gpio_state]
-        is_moving = True  # 開始移動
+        state[_ST_TARGET] = ANGLE_TARGETS[gpio_state]
+        state[_ST_SPEED] = current_speed
+        state[_ST_MOVING] = 1  # 開始移動
         
         # 顯示切換信息
-        direction = "綠色→紅色" if gpio_state else "紅色→綠色"
-        print(f"[{time.ticks_ms()//1000}s] GPIO改變: {gpio_state} ({direction})")
-        print(f"  顏色速度: {current_speed:.3f}")
+        if DEBUG:
+            direction = "綠色→紅色" if gpio_state else "紅色→綠色"
+            print(f"[{_ticks_ms()//1000}s] GPIO改變: {gpio_state} ({direction})")
+            print(f"  顏色速度: {current_speed} 單位/幀")
     
     # ======================================================
-    # 2. 更新顏色漸變
+    # 2. 整數核心: 顏色漸變 + 動畫計數 (viper tick)
     # ======================================================
-    if is_moving:
-        target_angle = math.pi/2 if gpio_state else 3*math.pi/2
-        angle_diff = target_angle - current_angle
-        
-        # 選擇最短路径
-        if abs(angle_diff) > math.pi:
-            if angle_diff > 0:
-                angle_diff -= 2 * math.pi
-            else:
-                angle_diff += 2 * math.pi
-        
-        # 使用當前速度移動
-        if abs(angle_diff) > current_speed:
-            # 向目標移動
-            current_angle += current_speed if angle_diff > 0 else -current_speed
-        else:
-            # 到達目標，停止
-            current_angle = target_angle
-            is_moving = False
-            
-            # 顯示到達信息
-            color_name = "紅色" if gpio_state else "綠色"
-            print(f"  到達目標顏色: {color_name}")
-    
-    # 計算當前顏色
-    sin_val = math.sin(current_angle)
-    red = int((sin_val + 1) * 127.5)
-    green = 255 - red
-    red = max(0, min(255, red))
-    green = max(0, min(255, green))
-    
+    flags = _tick(state, SIN_RED)
+
+    if DEBUG and flags & TICK_REACHED:
+        # 顯示到達信息
+        color_name = "紅色" if gpio_state else "綠色"
+        print(f"  到達目標顏色: {color_name}")
+
+    if flags & TICK_COLOR:
+        red = state[_ST_RED]
+        green = 255 - red
+
     # ======================================================
     # 3. 更新動畫幀
     # ======================================================
-    animation_counter += 1
-    
-    if animation_counter >= animation_speed:
-        animation_counter = 0
-        
+    if flags & TICK_ADVANCE:
         # 更新幀號（狀態機會處理循環邏輯）
         next_frame = anim_sm.update_frame()
-        
-        # 載入新幀
-        loaded_frame, success = load_animation_frame_safe(
-            root_path,
-            next_frame, 
-            gs4_buf, 
-            MAX_ANIMATION_FRAMES
-        )
-    
+
+        # 預載命中就直接翻面 (零 I/O),否則同步載入顯示緩衝
+        swapped = False
+        if _prefetch_enabled:
+            _buf_lock.acquire()
+            ready = _ready
+            _ready = None
+            _buf_lock.release()
+            if ready is not None and ready[0] == next_frame:
+                display_idx = ready[1]
+                swapped = True
+
+        if not swapped:
+            load_animation_frame_safe(
+                root_path,
+                next_frame,
+                gs4_bufs[display_idx],
+                MAX_ANIMATION_FRAMES
+            )
+
+        # 請求預載下一幀到背面緩衝,跟接下來的 blit+推屏重疊
+        if _prefetch_enabled:
+            request_prefetch(anim_sm.peek_next_frame(), 1 - display_idx)
+
     # ======================================================
     # 4. 渲染和顯示
     # ======================================================
-    # 4.1 生成當前顏色的調色板
-    build_gs4_palette_big_endian(pal_buf, red, green)
-    
-    # 4.2 應用調色板到當前動畫幀
-    rgb_fb.blit(gs4_fb, 0, 0, -1, pal_fb)
+    # 4.1 套用當前顏色的調色板 (查表整塊複製;顏色沒變就沿用)
+    if red != last_pal_key:
+        last_pal_key = red
+        pal_buf[:] = PAL_LUT[red]
+        rebuild_byte_lut(pal_buf, BYTE_LUT)  # 調色板變了才重建直查表
+
+    # 4.2 GS4 直查表展開成 RGB565 (viper,一次寫兩顆像素)
+    _expand(gs4_bufs[display_idx], rgb_buf, _GS4_N, BYTE_LUT)
     
     # 4.3 顯示到屏幕
-    tft.write_data(rgb_buf)
+    _write(rgb_buf)
     
     # ======================================================
     # 5. 性能監控
     # ======================================================
     frames += 1
-    current_time = time.ticks_ms()
+    current_time = _ticks_ms()
     
-    # 每秒顯示狀態
-    if time.ticks_diff(current_time, last_time) >= 1000:
-        fps = frames
+    # 每秒顯示狀態 (1Hz,保留;% 格式化定寬整數,比 f-string 省配置)
+    if _ticks_diff(current_time, last_time) >= 1000:
         state_text = "高電位" if gpio_state else "低電位"
-        moving_text = "移動中" if is_moving else "已停止"
-        mode_info = anim_sm.get_mode_info()
-        
-        loop_status = "循環中" if mode_info['in_loop'] else "過渡中"
-        first_run_text = "(開機)" if mode_info['is_first_run'] else ""
-        
-        print(f"FPS:{fps:2d} | 模式:{mode_info['mode']} | GPIO:{gpio_state}({state_text}) | "
-              f"幀:{mode_info['frame']:3d} | {loop_status}{first_run_text} | "
-              f"顏色:紅{red:3d}/綠{green:3d}")
-        
+        loop_status = "循環中" if anim_sm.in_loop else "過渡中"
+        first_run_text = "(開機)" if anim_sm.is_first_run else ""
+
+        print("FPS:%2d | 模式:%d | GPIO:%d(%s) | 幀:%3d | %s%s | 顏色:紅%3d/綠%3d" % (
+            frames, anim_sm.current_mode, gpio_state, state_text,
+            anim_sm.current_frame, loop_status, first_run_text, red, green))
+
         frames = 0
         last_time = current_time
\ No newline at end of file
@@ -9,15 +9,19 @@ import os
 import _thread
 import time
 
+# JPEG 整包預載的 RAM 預算 (位元組): 資源全部幀加總小於這個值
+# 才整包讀進 RAM;MicroPython 堆有限,保守取 64 KB
+JPEG_PRELOAD_BUDGET = 64 * 1024
+
 class ResourceBuffer:
-    """三重緩衝資源管理器 - 無鎖設計"""
+    """多重緩衝資源管理器 - 無鎖設計,緩衝數依資源深度自適應"""
     def __init__(self, name, root_path, config, decoder, strict_mode=False):
         """
-        三重緩衝設計:
-        - buffer_0: 顯示緩衝 (正在被LCD使用)
-        - buffer_1: 準備緩衝 (解碼完成,等待交換)
-        - buffer_2: 解碼緩衝 (後台正在解碼)
-        
+        緩衝數依 depth 自適應:
+        - depth == 1: 單緩衝 (靜態圖,不輪換)
+        - depth == 2: 雙緩衝乒乓 (顯示/解碼)
+        - depth >= 3: 三重緩衝 (顯示/準備/解碼)
+
         通過原子標誌位控制,無需鎖
         """
         self.name = name
@@ -25,6 +29,10 @@ class ResourceBuffer:
         self.config = config
         self.decoder = decoder
         self.strict_mode = strict_mode
+
+        # 綁定支援的話直接解碼進目標緩衝,省掉解碼後整幅複製
+        # (一次 hasattr 探測,不在每幀路徑上)
+        self._decode_into = getattr(decoder, 'decode_into', None)
         
         # 配置參數
         self.width = config['width']
@@ -37,24 +45,35 @@ class ResourceBuffer:
         self.buffer_size = self.width * self.height * 2
         self.jpeg_max_size = self.width * self.height * 4
         
-        # === 三重緩衝 ===
-        self.buffer_0 = bytearray(self.buffer_size)  # 顯示
-        self.buffer_1 = bytearray(self.buffer_size)  # 準備
-        self.buffer_2 = bytearray(self.buffer_size)  # 解碼
-        
-        # 預創建 memoryview (避免重複創建)
-        self.mv_0 = memoryview(self.buffer_0)
-        self.mv_1 = memoryview(self.buffer_1)
-        self.mv_2 = memoryview(self.buffer_2)
-        
-        # FrameBuffer 只在需要時創建一次
-        self.fb_0 = framebuf.FrameBuffer(self.buffer_0, self.width, self.height, framebuf.RGB565)
-        self.fb_1 = framebuf.FrameBuffer(self.buffer_1, self.width, self.height, framebuf.RGB565)
-        self.fb_2 = framebuf.FrameBuffer(self.buffer_2, self.width, self.height, framebuf.RGB565)
-        
-        # JPEG 緩衝
-        self.jpeg_buffer = bytearray(self.jpeg_max_size)
-        self.jpeg_mv = memoryview(self.jpeg_buffer)
+        # === 自適應緩衝數 ===
+        # depth==1 靜態圖一塊就夠;depth==2 乒乓雙緩衝;
+        # 更深的動畫才值得花第三塊 (每塊一整幅 16bpp,RAM 很貴)
+        if self.depth <= 1:
+            self.n_bufs = 1
+        elif self.depth == 2:
+            self.n_bufs = 2
+        else:
+            self.n_bufs = 3
+
+        # 緩衝 / 預創建 memoryview / FrameBuffer (都只建一次)
+        # 索引 → 元組下標,各方法用下標取代 if/elif 串接
+        self._bufs = tuple(bytearray(self.buffer_size)
+                           for _ in range(self.n_bufs))
+        self._mvs = tuple(memoryview(b) for b in self._bufs)
+        self._fbs = tuple(
+            framebuf.FrameBuffer(b, self.width, self.height, framebuf.RGB565)
+            for b in self._bufs)
+
+        # === JPEG 來源: 夠小就整包預載進 RAM,免去每幀 open/read ===
+        self._jpeg_blobs = self._preload_jpegs()
+
+        # 預載不成立才需要共用的檔案讀取緩衝
+        if self._jpeg_blobs is None:
+            self.jpeg_buffer = bytearray(self.jpeg_max_size)
+            self.jpeg_mv = memoryview(self.jpeg_buffer)
+        else:
+            self.jpeg_buffer = None
+            self.jpeg_mv = None
         
         # === 無鎖狀態控制 (使用原子標誌) ===
         # 0: buffer_0, 1: buffer_1, 2: buffer_2
@@ -68,8 +87,8 @@ class ResourceBuffer:
         self.decode_thread_running = False
         
         # === 初始化 ===
-        # 同步加載第一幀到 buffer_0
-        self._load_frame_to_buffer(0, self.buffer_0, self.mv_0)
+        # 同步加載第一幀到 buffer 0
+        self._load_frame_to_buffer(0, self._bufs[0], self._mvs[0])
         self.current_frame = 0
         self.display_idx = 0
         
@@ -80,23 +99,50 @@ class ResourceBuffer:
     def _get_file_path(self, frame_index):
         """構建文件路徑"""
         return f"{self.root_path}{self.name}/{frame_index:03d}.jpeg"
-    
+
+    def _preload_jpegs(self):
+        """資源夠小就把全部 JPEG 讀進 RAM,加載幀免檔案系統來回
+
+        先用 stat 加總檔案大小,超出 JPEG_PRELOAD_BUDGET 或缺檔
+        就放棄 (回傳 None),退回逐幀 open/read。
+        """
+        try:
+            total = 0
+            for i in range(self.depth):
+                total += os.stat(self._get_file_path(i))[6]
+                if total > JPEG_PRELOAD_BUDGET:
+                    return None
+
+            blobs = []
+            for i in range(self.depth):
+                with open(self._get_file_path(i), "rb") as f:
+                    blobs.append(f.read())
+            return blobs
+        except OSError:
+            return None
+
     def _load_frame_to_buffer(self, frame_index, target_buffer, target_mv):
         """同步加載JPEG到指定緩衝"""
         try:
-            file_path = self._get_file_path(frame_index)
-            
-            # 讀取JPEG
-            with open(file_path, "rb") as f:
-                f.readinto(self.jpeg_mv)
-            
-            # 解碼
-            decoded_data = self.decoder.decode(self.jpeg_buffer)
-            
-            # 快速複製 (使用 memoryview 切片)
-            decoded_mv = memoryview(decoded_data)
-            target_mv[:self.buffer_size] = decoded_mv[:self.buffer_size]
-            
+            blobs = self._jpeg_blobs
+            if blobs is not None:
+                # 已整包預載: 直接用 RAM 裡的 JPEG,零檔案 I/O
+                jpeg_data = blobs[frame_index]
+            else:
+                # 讀取JPEG
+                with open(self._get_file_path(frame_index), "rb") as f:
+                    f.readinto(self.jpeg_mv)
+                jpeg_data = self.jpeg_buffer
+
+            if self._decode_into is not None:
+                # 直接解碼進目標緩衝 (零複製)
+                self._decode_into(jpeg_data, target_buffer)
+            else:
+                # 舊綁定: 解碼到暫存再整塊複製 (memoryview 切片)
+                decoded_data = self.decoder.decode(jpeg_data)
+                decoded_mv = memoryview(decoded_data)
+                target_mv[:self.buffer_size] = decoded_mv[:self.buffer_size]
+
             return True
         except Exception as e:
             if self.strict_mode:
@@ -107,13 +153,8 @@ class ResourceBuffer:
         """後台解碼工作線程"""
         try:
             # 根據 buffer_idx 選擇目標緩衝
-            if buffer_idx == 0:
-                target_buffer, target_mv = self.buffer_0, self.mv_0
-            elif buffer_idx == 1:
-                target_buffer, target_mv = self.buffer_1, self.mv_1
-            else:
-                target_buffer, target_mv = self.buffer_2, self.mv_2
-            
+            target_buffer, target_mv = self._bufs[buffer_idx], self._mvs[buffer_idx]
+
             # 執行解碼
             success = self._load_frame_to_buffer(frame_index, target_buffer, target_mv)
             
@@ -152,12 +193,7 @@ class ResourceBuffer:
     
     def get_current_buffer(self):
         """獲取當前顯示緩衝 (零拷貝,直接返回 FrameBuffer)"""
-        if self.display_idx == 0:
-            return self.fb_0
-        elif self.display_idx == 1:
-            return self.fb_1
-        else:
-            return self.fb_2
+        return self._fbs[self.display_idx]
     
     def get_next_frame(self):
         """
@@ -174,7 +210,13 @@ class ResourceBuffer:
         # 檢查是否有準備好的幀
         if self.ready_idx != -1:
             # 找出空閒緩衝 (用於下一次解碼)
-            idle_idx = ({0, 1, 2} - {self.display_idx, self.ready_idx}).pop()
+            if self.n_bufs == 3:
+                # 索引恆為 {0,1,2} 且 0^1^2 = 3,XOR 掉兩個在用的
+                # 就是剩下那個;免掉每幀兩個 set 配置與差集運算
+                idle_idx = 3 ^ self.display_idx ^ self.ready_idx
+            else:
+                # 雙緩衝乒乓: 換下來的顯示緩衝就是下一塊解碼緩衝
+                idle_idx = self.display_idx
             
             # 切換顯示緩衝 (原子操作)
             old_display = self.display_idx
@@ -208,14 +250,8 @@ class ResourceBuffer:
             timeout += 1
         
         # 同步加載到當前顯示緩衝
-        if self.display_idx == 0:
-            target_buffer, target_mv = self.buffer_0, self.mv_0
-        elif self.display_idx == 1:
-            target_buffer, target_mv = self.buffer_1, self.mv_1
-        else:
-            target_buffer, target_mv = self.buffer_2, self.mv_2
-        
-        if self._load_frame_to_buffer(frame_index, target_buffer, target_mv):
+        idx = self.display_idx
+        if self._load_frame_to_buffer(frame_index, self._bufs[idx], self._mvs[idx]):
             self.current_frame = frame_index
             self.ready_idx = -1
             
@@ -223,7 +259,7 @@ class ResourceBuffer:
             if self.depth > 1:
                 next_frame = (frame_index + 1) % self.depth
                 # 選擇非顯示緩衝
-                preload_idx = 1 if self.display_idx != 1 else 2
+                preload_idx = (self.display_idx + 1) % self.n_bufs
                 self._start_background_decode(next_frame, buffer_idx=preload_idx)
         
         return self.get_current_buffer()
@@ -240,14 +276,8 @@ class ResourceBuffer:
             timeout += 1
         
         # 加載到顯示緩衝
-        if self.display_idx == 0:
-            target_buffer, target_mv = self.buffer_0, self.mv_0
-        elif self.display_idx == 1:
-            target_buffer, target_mv = self.buffer_1, self.mv_1
-        else:
-            target_buffer, target_mv = self.buffer_2, self.mv_2
-        
-        if self._load_frame_to_buffer(digit, target_buffer, target_mv):
+        idx = self.display_idx
+        if self._load_frame_to_buffer(digit, self._bufs[idx], self._mvs[idx]):
             return self.get_current_buffer()
         return None
     
@@ -262,16 +292,12 @@ class ResourceBuffer:
         self.ready_idx = -1
         
         # 加載到當前顯示緩衝
-        if self.display_idx == 0:
-            self._load_frame_to_buffer(0, self.buffer_0, self.mv_0)
-        elif self.display_idx == 1:
-            self._load_frame_to_buffer(0, self.buffer_1, self.mv_1)
-        else:
-            self._load_frame_to_buffer(0, self.buffer_2, self.mv_2)
+        idx = self.display_idx
+        self._load_frame_to_buffer(0, self._bufs[idx], self._mvs[idx])
         
         # 預載下一幀
         if self.depth > 1:
-            preload_idx = 1 if self.display_idx != 1 else 2
+            preload_idx = (self.display_idx + 1) % self.n_bufs
             self._start_background_decode(1, buffer_idx=preload_idx)
     
     def cleanup(self):
@@ -325,6 +351,7 @@ class JpegBufferController:
     def _init_text(self, text_cfg):
         """初始化時間顯示 - 優化版本"""
         self.seconds = -1
+        self.time_dirty_x = None  # 最近一次更新變動的欄區間
         
         # === 預載數字緩存 (0-9 + 冒號) ===
         self._digit_cache = {}
@@ -422,20 +449,32 @@ class JpegBufferController:
         
         text_cfg = self.resources['text'].config
         digit_width = text_cfg['width']
-        
-        # 只更新變化的位置
+
+        # 只更新變化的位置;沒變的連最終 blit 也省掉
+        # (大多數秒數只動 1-2 個數字,time_buffer 裡其餘位置已是現值)
+        dirty_min = -1
+        dirty_max = -1
         for i, digit in enumerate(digits):
             cache = self._position_cache[i]
-            
-            if cache['digit'] != digit:
-                # 從預載緩存複製 (使用 blit)
-                if digit in self._digit_cache:
-                    cache['fb'].blit(self._digit_cache[digit], 0, 0)
-                    cache['digit'] = digit
-            
-            # 繪製到最終緩衝 (使用 blit)
-            self.time_buffer.blit(cache['fb'], i * digit_width, 0)
-        
+
+            if cache['digit'] == digit:
+                continue
+
+            # 從預載緩存複製 (使用 blit)
+            if digit in self._digit_cache:
+                cache['fb'].blit(self._digit_cache[digit], 0, 0)
+                cache['digit'] = digit
+
+                # 繪製到最終緩衝 (使用 blit)
+                x = i * digit_width
+                self.time_buffer.blit(cache['fb'], x, 0)
+                if dirty_min < 0:
+                    dirty_min = x
+                dirty_max = x + digit_width
+
+        # 髒欄區間 (x_min, x_max): 呼叫端可用 set_window 只送變動的欄
+        self.time_dirty_x = (dirty_min, dirty_max) if dirty_min >= 0 else None
+
         return self.time_buffer
     
     def get_resource_info(self, resource_name):